@@ -1,12 +1,20 @@
 # Database connection management module
 import os
-from typing import Optional
+import threading
+from typing import Iterator
 import mysql.connector
+from mysql.connector import errorcode
+from mysql.connector.constants import ClientFlag
 import logging
 
 logger = logging.getLogger(__name__)
 
-_connection: Optional[mysql.connector.connection.MySQLConnection] = None
+# Connection and server-side prepared cursors (keyed by their query string) are kept per thread, as sync
+# endpoints run in FastAPI's threadpool and a MySQL connection must not be used by two threads at once
+_local = threading.local()
+
+# Rows read per round of fetchmany when iterating over a result set
+FETCH_BATCH_SIZE = 256
 
 # Environment variables for database connection
 MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
@@ -15,35 +23,78 @@ MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
 MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "organizr")
 
+def _connect(**kwargs):
+    """Open a new connection to the MySQL server"""
+    # Autocommit, so reads of one thread's connection are not pinned to a snapshot that misses other threads' writes.
+    # FOUND_ROWS makes the rowcount of an UPDATE the matched instead of the changed rows, so it tells whether the row exists.
+    # Rows are streamed, so the rest of a result left unread by a failed request is discarded instead of blocking the connection.
+    return mysql.connector.connect(
+        host=MYSQL_HOST,
+        user=MYSQL_USER,
+        password=MYSQL_PASSWORD,
+        port=MYSQL_PORT,
+        autocommit=True,
+        consume_results=True,
+        client_flags=[ClientFlag.FOUND_ROWS],
+        **kwargs
+    )
+
 def get_connection():
-    """Get database connection, create if not exists"""
-    global _connection
-    
-    if _connection is None or not _connection.is_connected():
+    """Get the database connection of the current thread, create if not exists"""
+    connection = getattr(_local, "connection", None)
+
+    if connection is None or not connection.is_connected():
+        # Statements prepared on a previous connection are gone with it
+        _local.prepared_cursors = {}
         try:
-            _connection = mysql.connector.connect(
-                host=MYSQL_HOST,
-                user=MYSQL_USER,
-                password=MYSQL_PASSWORD,
-                port=MYSQL_PORT,
-                autocommit=False
-            )
+            try:
+                _local.connection = _connect(database=MYSQL_DATABASE)
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_BAD_DB_ERROR:
+                    raise
+                # First start, the database is yet to be created by the setup
+                _local.connection = _connect()
             logger.info("Database connection established")
         except mysql.connector.Error as e:
+            _local.connection = None
             logger.error(f"Error connecting to database: {e}")
             raise
 
-    return _connection
+    return _local.connection
 
 def get_cursor():
     """Get a new cursor from the database connection"""
     conn = get_connection()
     return conn.cursor()
 
+def iter_rows(cursor, batch_size=FETCH_BATCH_SIZE) -> Iterator[tuple]:
+    """Iterate over the rows of the executed query, reading them from the server in batches instead of all at once"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def get_prepared_cursor(query):
+    """
+    Get a cursor holding a server-side prepared statement for the given query.
+
+    The statement is prepared once per connection and re-executed afterwards, so MySQL skips
+    parsing and planning it again. Pass the same (module level) query string every time, the
+    connector only reuses the prepared statement if it is the very same string object.
+    """
+    conn = get_connection()
+    cursor = _local.prepared_cursors.get(query)
+    if cursor is None:
+        cursor = conn.cursor(prepared=True)
+        _local.prepared_cursors[query] = cursor
+    return cursor
+
 def close_connection():
-    """Close database connection"""
-    global _connection
-    if _connection and _connection.is_connected():
-        _connection.close()
-        _connection = None
+    """Close the database connection of the current thread"""
+    connection = getattr(_local, "connection", None)
+    _local.prepared_cursors = {}
+    if connection and connection.is_connected():
+        connection.close()
+        _local.connection = None
         logger.info("Database connection closed")
\ No newline at end of file
@@ -23,7 +23,6 @@ async def create_app(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         cursor.execute(
             "INSERT INTO apps (name) VALUES (%s)",
@@ -52,7 +51,6 @@ async def list_apps(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
         cursor.execute("SELECT id, name, created_at FROM apps")
 
         apps = []
@@ -79,7 +77,6 @@ async def update_app(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         cursor.execute("UPDATE apps SET name = %s WHERE name = %s", (app_update.name, app_name))
         database.get_connection().commit()
@@ -111,7 +108,6 @@ async def delete_app(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         cursor.execute("DELETE FROM apps WHERE name = %s", (app_name,))
         database.get_connection().commit()
@@ -142,7 +138,6 @@ async def create_user_link(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Check if app exists
         cursor.execute("SELECT id FROM apps WHERE name = %s", (app_name,))
@@ -201,7 +196,6 @@ async def list_user_links(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         cursor.execute("SELECT id FROM apps WHERE name = %s", (app_name,))
         app = cursor.fetchone()
@@ -238,7 +232,6 @@ async def delete_user_link(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         cursor.execute("SELECT id FROM apps WHERE name = %s", (app_name,))
         app = cursor.fetchone()
@@ -282,7 +275,6 @@ async def translate_id(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         cursor.execute("SELECT id FROM apps WHERE name = %s", (app_name,))
         app = cursor.fetchone()
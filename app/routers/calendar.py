@@ -1,7 +1,7 @@
 # Calendar route of the API, similar in its logic to tasks
 
 import logging
-from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi import APIRouter, Body, HTTPException, Header, Query
 from typing import Optional, List, Dict, Any
 import database
 import utils
@@ -12,6 +12,17 @@ import json
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Columns of a calendar event as returned by the api, in the order every event query selects them
+_EVENT_COLUMNS = ("id", "user_id", "title", "description", "start_datetime", "end_datetime", "rrule", "tags")
+_EVENT_COLUMNS_SQL = ", ".join(_EVENT_COLUMNS)
+
+def _iter_events(cursor):
+    """Yield the events of the executed query as dicts, reading the rows from the server in batches"""
+    for row in database.iter_rows(cursor):
+        item = dict(zip(_EVENT_COLUMNS, row))
+        item["tags"] = utils.parse_tags(item.get("tags"))
+        yield item
+
 @router.post("/", response_model=schemas.CalendarEventCreate)
 async def create_event(
         title: str,
@@ -39,7 +50,6 @@ async def create_event(
     # Insert event into database
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Process tags, which may come as a list or a JSON string in a list
         processed_tags = []
@@ -106,7 +116,10 @@ async def query_events(
         for_user: Optional[str] = None,
         api_key: str = Header(..., alias="X-API-Key"),
 ):
-    """Query calendar events by text, tags, and/or time range with configurable match mode"""
+    """
+    Query calendar events by text, tags, and/or time range with configurable match mode.
+    search_text matches events whose title or description contains it, or contains all of its words as word prefixes.
+    """
     requester_id = utils.validate_user_for_action(api_key, for_user)
 
     if not any([search_text, tags, start_after, end_before]):
@@ -128,7 +141,6 @@ async def query_events(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         results = []
 
@@ -137,31 +149,15 @@ async def query_events(
                      "start_datetime <= %s AND COALESCE(end_datetime, start_datetime) >= %s"]
         base_params = [requester_id, end_dt, start_dt]
         
-        # For AND mode, add all filters to SQL; for OR mode, query all and filter after
-        if match_mode.lower() == "and":
-            tt_conds, tt_params = utils.build_query_filters(search_text, tags)
-            base_conds.extend(tt_conds)
-            base_params.extend(tt_params)
+        # Text and tag filters in either match mode are applied by SQL
+        tt_conds, tt_params = utils.build_query_filters(search_text, tags, match_mode=match_mode)
+        base_conds.extend(tt_conds)
+        base_params.extend(tt_params)
 
-        sql = f"SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE {' AND '.join(base_conds)}"
+        sql = f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE {' AND '.join(base_conds)}"
         cursor.execute(sql, tuple(base_params))
         
-        rows = cursor.fetchall()
-        cols = [d[0] for d in cursor.description]
-        items = []
-        for row in rows:
-            item = {col: row[i] for i, col in enumerate(cols)}
-            if isinstance(item.get("tags"), str):
-                try:
-                    item["tags"] = json.loads(item["tags"])
-                except (json.JSONDecodeError, TypeError):
-                    item["tags"] = []
-            items.append(item)
-        
-        if match_mode.lower() == "or":
-            items = utils.apply_match_mode_filter(items, search_text, tags, None, match_mode)
-        
-        results.extend(items)
+        results.extend(_iter_events(cursor))
 
         # Recurring events are more complex due to rrule expansion, cant handle in sql with other entries
         if has_time_window:
@@ -169,28 +165,14 @@ async def query_events(
             rec_conds = ["user_id = %s", "(rrule IS NOT NULL AND rrule <> '')", "start_datetime <= %s"]
             rec_params = [requester_id, end_dt]
             
-            if match_mode.lower() == "and":
-                rec_conds.extend(tt_conds)
-                rec_params.extend(tt_params)
+            rec_conds.extend(tt_conds)
+            rec_params.extend(tt_params)
 
-            sql_rec = f"SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE {' AND '.join(rec_conds)}"
+            sql_rec = f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE {' AND '.join(rec_conds)}"
             cursor.execute(sql_rec, tuple(rec_params))
             
-            rec_rows = cursor.fetchall()
-            rec_events = []
-            for row in rec_rows:
-                ev = {col: row[i] for i, col in enumerate(cols)}
-                if isinstance(ev.get("tags"), str):
-                    try:
-                        ev["tags"] = json.loads(ev["tags"])
-                    except (json.JSONDecodeError, TypeError):
-                        ev["tags"] = []
-                rec_events.append(ev)
-            
-            occurrences = utils.handle_rrule_query(rec_events, start_dt, end_dt)
-            
-            if match_mode.lower() == "or":
-                occurrences = utils.apply_match_mode_filter(occurrences, search_text, tags, None, match_mode)
+            # The events are streamed into the expansion instead of being read into a list first
+            occurrences = utils.handle_rrule_query(_iter_events(cursor), start_dt, end_dt)
             
             results.extend(occurrences)
         else:
@@ -198,28 +180,13 @@ async def query_events(
             rec_conds = ["user_id = %s", "(rrule IS NOT NULL AND rrule <> '')"]
             rec_params = [requester_id]
             
-            if match_mode.lower() == "and":
-                rec_conds.extend(tt_conds)
-                rec_params.extend(tt_params)
+            rec_conds.extend(tt_conds)
+            rec_params.extend(tt_params)
 
-            sql_rec = f"SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE {' AND '.join(rec_conds)}"
+            sql_rec = f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE {' AND '.join(rec_conds)}"
             cursor.execute(sql_rec, tuple(rec_params))
             
-            rec_rows = cursor.fetchall()
-            rec_items = []
-            for row in rec_rows:
-                item = {col: row[i] for i, col in enumerate(cols)}
-                if isinstance(item.get("tags"), str):
-                    try:
-                        item["tags"] = json.loads(item["tags"])
-                    except (json.JSONDecodeError, TypeError):
-                        item["tags"] = []
-                rec_items.append(item)
-            
-            if match_mode.lower() == "or":
-                rec_items = utils.apply_match_mode_filter(rec_items, search_text, tags, None, match_mode)
-            
-            results.extend(rec_items)
+            results.extend(_iter_events(cursor))
 
         results.sort(key=lambda x: (x.get("start_datetime") or datetime.datetime.min, x.get("id") or 0))
         logger.info(f"Found {len(results)} events for user {requester_id}")
@@ -242,18 +209,16 @@ async def get_event(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Get the event from the database
-        cursor.execute("SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE id = %s", (entry_id,))
+        cursor.execute(f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE id = %s", (entry_id,))
         event_row = cursor.fetchone()
 
         if not event_row:
             raise HTTPException(status_code=404, detail="Event not found")
 
         # Convert database row to dictionary to prevent indexing errors
-        columns = [desc[0] for desc in cursor.description]
-        event_dict = dict(zip(columns, event_row))
+        event_dict = dict(zip(_EVENT_COLUMNS, event_row))
         
         # Parse JSON tags field
         tags_json = event_dict.get("tags")
@@ -309,18 +274,16 @@ async def update_event(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # First get the current entry to know what fields to update
-        cursor.execute("SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE id = %s", (event_id,))
+        cursor.execute(f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE id = %s", (event_id,))
         current_event_row = cursor.fetchone()
 
         if not current_event_row:
             logger.error(f"Calendar entry {event_id} not found")
             raise HTTPException(status_code=404, detail="Calendar entry not found")
         
-        columns = [desc[0] for desc in cursor.description]
-        current_event = dict(zip(columns, current_event_row))
+        current_event = dict(zip(_EVENT_COLUMNS, current_event_row))
 
 
         # Prepare update values
@@ -366,9 +329,9 @@ async def update_event(
         database.get_connection().commit()
 
         # Get updated entry
-        cursor.execute("SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE id = %s", (event_id,))
+        cursor.execute(f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE id = %s", (event_id,))
         updated_event_row = cursor.fetchone()
-        updated_event = dict(zip(columns, updated_event_row))
+        updated_event = dict(zip(_EVENT_COLUMNS, updated_event_row))
 
         logger.info(f"Updated calendar entry with ID {event_id}")
 
@@ -402,7 +365,6 @@ async def delete_event(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Check if the entry exists
         cursor.execute("SELECT * FROM calendar_entries WHERE id = %s", (event_id,))
@@ -427,6 +389,30 @@ async def delete_event(
         logger.error(f"Failed to delete calendar entry: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to delete calendar entry: {str(e)}")
 
+@router.post("/bulk-delete", response_model=schemas.MessageResponse)
+def delete_events_bulk(
+    ids: List[int] = Body(..., embed=True),
+    api_key: str = Header(..., alias="X-API-Key"),
+):
+    """Delete several events with one statement, none of them if any is missing or not the requester's"""
+    utils.validate_entry_access_batch(api_key, utils.ResourceType.CALENDAR, ids)
+
+    if not ids:
+        return {"message": "No events deleted"}
+
+    try:
+        cursor = database.get_cursor()
+        cursor.execute(f"DELETE FROM calendar_entries WHERE id IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+        database.get_connection().commit()
+
+        logger.info(f"Deleted events {ids}")
+        return {"message": f"Deleted {cursor.rowcount} events"}
+
+    except Exception as e:
+        database.get_connection().rollback()
+        logger.error(f"Failed to delete events {ids}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete events: {str(e)}")
+
 @router.get("/search/", response_model=List[schemas.CalendarEvent])
 async def search_events(
     query: str,
@@ -440,7 +426,6 @@ async def search_events(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Split query into words for matching
         query_words = query.split()
@@ -452,14 +437,13 @@ async def search_events(
             query_conds.append("(title LIKE %s OR description LIKE %s OR tags LIKE %s)")
             query_params.extend([f"%{word}%", f"%{word}%", f"%{word}%"])
 
-        sql = "SELECT id, user_id, title, description, start_datetime, end_datetime, rrule, tags FROM calendar_entries WHERE " + " AND ".join(query_conds)
+        sql = f"SELECT {_EVENT_COLUMNS_SQL} FROM calendar_entries WHERE " + " AND ".join(query_conds)
         cursor.execute(sql, tuple(query_params))
         
         rows = cursor.fetchall()
-        cols = [d[0] for d in cursor.description]
         results = []
         for row in rows:
-            item = {col: row[i] for i, col in enumerate(cols)}
+            item = dict(zip(_EVENT_COLUMNS, row))
             if isinstance(item.get("tags"), str):
                 try:
                     item["tags"] = json.loads(item["tags"])
@@ -487,7 +471,6 @@ async def delete_tag_from_event(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Check if the entry exists and get current tags
         cursor.execute("SELECT tags FROM calendar_entries WHERE id = %s", (entry_id,))
@@ -498,15 +481,7 @@ async def delete_tag_from_event(
             raise HTTPException(status_code=404, detail="Calendar entry not found")
 
         # Parse current tags
-        current_tags_json = result[0]
-        current_tags = []
-        if current_tags_json:
-            try:
-                current_tags = json.loads(current_tags_json)
-                if not isinstance(current_tags, list):
-                    current_tags = [] # Ensure it's a list
-            except (json.JSONDecodeError, TypeError):
-                current_tags = []
+        current_tags = utils.parse_tags(result[0]) or []
 
         # Remove the specified tag if it exists
         if tag in current_tags:
@@ -1,7 +1,7 @@
 # Notes route of the API
 
 import logging
-from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi import APIRouter, Body, HTTPException, Header, Query
 from typing import Optional, List
 import database
 import utils
@@ -11,6 +11,10 @@ import json
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Columns of a note as returned by the api, in the order every note query selects them
+_NOTE_COLUMNS = ("id", "user_id", "title", "content", "tags", "is_log", "created_at", "updated_at")
+_NOTE_COLUMNS_SQL = ", ".join(_NOTE_COLUMNS)
+
 @router.post("/", response_model=schemas.Note)
 async def create_note(
     note: schemas.NoteCreate,
@@ -22,25 +26,23 @@ async def create_note(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         tags_json = utils.list_to_json(note.tags) if note.tags else None
 
         insert_query = """
-            INSERT INTO notes (user_id, title, content, tags)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO notes (user_id, title, content, tags, is_log)
+            VALUES (%s, %s, %s, %s, %s)
         """
-        cursor.execute(insert_query, (target_user_id, note.title, note.content, tags_json))
+        cursor.execute(insert_query, (target_user_id, note.title, note.content, tags_json, note.is_log))
         note_id = cursor.lastrowid
         database.get_connection().commit()
 
         logger.info(f"Created note '{note.title}' for user {target_user_id} with ID {note_id}")
 
         # Fetch the created note to get all fields populated
-        cursor.execute("SELECT id, user_id, title, content, tags, created_at, updated_at FROM notes WHERE id = %s", (note_id,))
+        cursor.execute(f"SELECT {_NOTE_COLUMNS_SQL} FROM notes WHERE id = %s", (note_id,))
         new_note_row = cursor.fetchone()
-        cols = [d[0] for d in cursor.description]
-        new_note = dict(zip(cols, new_note_row))
+        new_note = dict(zip(_NOTE_COLUMNS, new_note_row))
         new_note["tags"] = utils.json_to_list(new_note.get("tags"))
 
         return new_note
@@ -60,7 +62,7 @@ def _build_get_notes_query(
     match_mode: Optional[str] = "and",
 ):
     """Build SQL query and parameters for getting notes with filters"""
-    base_query = "SELECT id, user_id, title, content, tags, created_at, updated_at FROM notes WHERE user_id = %s"
+    base_query = f"SELECT {_NOTE_COLUMNS_SQL} FROM notes WHERE user_id = %s"
     query_params = [target_user_id]
     
     filter_conditions = []
@@ -68,12 +70,24 @@ def _build_get_notes_query(
     if note_id is not None:
         filter_conditions.append("id = %s")
         query_params.append(note_id)
+    # Text filters match word prefixes through the fulltext indexes and the text as a substring, LIKE alone if no word
+    # of the text is indexed. Content is searched without the notes marked as logs, which search_content leaves empty.
     if title:
-        filter_conditions.append("title LIKE %s")
-        query_params.append(f"%{title}%")
+        fulltext_query = utils.to_fulltext_query(title)
+        if fulltext_query:
+            filter_conditions.append("(MATCH(title) AGAINST (%s IN BOOLEAN MODE) OR title LIKE %s)")
+            query_params.extend([fulltext_query, f"%{title}%"])
+        else:
+            filter_conditions.append("title LIKE %s")
+            query_params.append(f"%{title}%")
     if content:
-        filter_conditions.append("content LIKE %s")
-        query_params.append(f"%{content}%")
+        fulltext_query = utils.to_fulltext_query(content)
+        if fulltext_query:
+            filter_conditions.append("(MATCH(search_content) AGAINST (%s IN BOOLEAN MODE) OR search_content LIKE %s)")
+            query_params.extend([fulltext_query, f"%{content}%"])
+        else:
+            filter_conditions.append("search_content LIKE %s")
+            query_params.append(f"%{content}%")
     if tags:
         tag_conditions = []
         for tag in tags:
@@ -106,13 +120,13 @@ async def get_notes(
     """
     Get notes based on filters.
     - Pass no filters to get all notes for the user.
+    - title and content match notes containing the text, or all of its words as word prefixes.
     - Filters can be combined in AND or OR mode.
     """
     target_user_id = utils.validate_user_for_action(api_key, for_user)
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         sql, query_params = _build_get_notes_query(
             target_user_id, title, content, tags, note_id, match_mode
@@ -121,8 +135,7 @@ async def get_notes(
         cursor.execute(sql, query_params)
 
         rows = cursor.fetchall()
-        cols = [d[0] for d in cursor.description]
-        notes = [dict(zip(cols, row)) for row in rows]
+        notes = [dict(zip(_NOTE_COLUMNS, row)) for row in rows]
 
         for note in notes:
             note["tags"] = utils.json_to_list(note.get("tags"))
@@ -156,6 +169,9 @@ async def update_note(
     if note_update.tags is not None:
         update_fields.append("tags = %s")
         update_params.append(utils.list_to_json(note_update.tags))
+    if note_update.is_log is not None:
+        update_fields.append("is_log = %s")
+        update_params.append(note_update.is_log)
 
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields to update")
@@ -164,7 +180,6 @@ async def update_note(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         update_query = f"UPDATE notes SET {', '.join(update_fields)} WHERE id = %s"
         cursor.execute(update_query, tuple(update_params))
@@ -174,10 +189,9 @@ async def update_note(
             raise HTTPException(status_code=404, detail="Note not found")
 
         # Fetch the updated note
-        cursor.execute("SELECT id, user_id, title, content, tags, created_at, updated_at FROM notes WHERE id = %s", (note_id,))
+        cursor.execute(f"SELECT {_NOTE_COLUMNS_SQL} FROM notes WHERE id = %s", (note_id,))
         updated_note_row = cursor.fetchone()
-        cols = [d[0] for d in cursor.description]
-        updated_note = dict(zip(cols, updated_note_row))
+        updated_note = dict(zip(_NOTE_COLUMNS, updated_note_row))
         updated_note["tags"] = utils.json_to_list(updated_note.get("tags"))
 
         logger.info(f"Updated note {note_id}")
@@ -191,6 +205,34 @@ async def update_note(
         raise HTTPException(status_code=500, detail=f"Failed to update note {note_id}: {str(e)}")
 
 
+@router.post("/{note_id}/append", response_model=schemas.MessageResponse)
+def append_to_note(
+    note_id: int,
+    note_append: schemas.NoteAppend,
+    api_key: str = Header(..., alias="X-API-Key"),
+):
+    """Append text to a note's content in place, without sending or returning the content already there."""
+    utils.validate_entry_access(api_key, utils.ResourceType.NOTE, note_id)
+
+    try:
+        cursor = database.get_cursor()
+        cursor.execute("UPDATE notes SET content = CONCAT(content, %s) WHERE id = %s", (note_append.content, note_id))
+        database.get_connection().commit()
+
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Note not found")
+
+        logger.info(f"Appended {len(note_append.content)} characters to note {note_id}")
+        return {"message": "Note appended successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        database.get_connection().rollback()
+        logger.error(f"Failed to append to note {note_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to append to note {note_id}: {str(e)}")
+
+
 @router.delete("/{note_id}", response_model=schemas.MessageResponse)
 async def delete_note(
     note_id: int,
@@ -201,7 +243,6 @@ async def delete_note(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         delete_query = "DELETE FROM notes WHERE id = %s"
         cursor.execute(delete_query, (note_id,))
@@ -218,4 +259,28 @@ async def delete_note(
             raise e
         database.get_connection().rollback()
         logger.error(f"Failed to delete note {note_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to delete note {note_id}: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to delete note {note_id}: {str(e)}")
+
+@router.post("/bulk-delete", response_model=schemas.MessageResponse)
+def delete_notes_bulk(
+    ids: List[int] = Body(..., embed=True),
+    api_key: str = Header(..., alias="X-API-Key"),
+):
+    """Delete several notes with one statement, none of them if any is missing or not the requester's"""
+    utils.validate_entry_access_batch(api_key, utils.ResourceType.NOTE, ids)
+
+    if not ids:
+        return {"message": "No notes deleted"}
+
+    try:
+        cursor = database.get_cursor()
+        cursor.execute(f"DELETE FROM notes WHERE id IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+        database.get_connection().commit()
+
+        logger.info(f"Deleted notes {ids}")
+        return {"message": f"Deleted {cursor.rowcount} notes"}
+
+    except Exception as e:
+        database.get_connection().rollback()
+        logger.error(f"Failed to delete notes {ids}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete notes: {str(e)}")
@@ -1,19 +1,167 @@
 # Tasks route of the API
 
 import logging
-from fastapi import APIRouter, HTTPException, Header, Query
+import functools
+import hashlib
+import itertools
+import heapq
+from operator import itemgetter
+from fastapi import APIRouter, Body, HTTPException, Header, Query, Request, Response
 from typing import Optional, List, Dict, Any, Tuple
 import database
 import utils
 import datetime
 import schemas
-import json
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Columns of a task as returned by the api, in the order every task query selects them
+_TASK_COLUMNS = ("id", "user_id", "title", "description", "status", "due_date", "rrule", "tags")
+
+# Hot single-row statements, executed as server-side prepared statements
+_SELECT_TASK_BY_ID = f"SELECT {', '.join(_TASK_COLUMNS)} FROM tasks WHERE id = %s"
+_DELETE_TASK_BY_ID = "DELETE FROM tasks WHERE id = %s"
+_DELETE_OWN_TASK_BY_ID = "DELETE FROM tasks WHERE id = %s AND user_id = %s"
+
+# Recurring tasks get their occurrences stored in task_occurrences up to this far ahead (and at most this many),
+# queries reaching past the stored occurrences of a task expand it in Python instead
+_OCCURRENCE_HORIZON = datetime.timedelta(days=2 * 365)
+_MAX_STORED_OCCURRENCES = 5000
+# occurrences_until of a task whose occurrences are all stored
+_OCCURRENCES_COMPLETE = datetime.datetime(9999, 12, 31, 23, 59, 59)
+
+# Order of query results: due date, then id. Every query selects its tasks in this order, so the parts are merged instead of sorted
+_TASK_ORDER = itemgetter("due_date", "id")
+
+# Length of task_tags.tag, longer tags are stored and queried by their prefix
+_MAX_TAG_LENGTH = 255
+
+# Query templates of query_tasks, one per combination of filters so requests only pick the matching one
+_MAX_TEMPLATE_TAGS = 16
+
+def _build_task_query(kind: str, text_mode: Optional[str], n_tags: int, has_status: bool, has_window: bool) -> str:
+    """
+    Build the task query for one combination of filters, text_mode is None, 'fulltext' or 'like'.
+
+    kind 'single' selects non-recurring tasks, 'occurrences' the stored occurrences of recurring tasks in a window
+    and 'recurring' the recurring tasks whose stored occurrences do not reach the end of the window.
+    """
+    if kind == "single":
+        conds = ["user_id = %s", "is_recurring = 0"]
+        if has_window:
+            conds.append("due_date IS NOT NULL AND due_date <= %s AND due_date >= %s")
+    elif kind == "recurring":
+        conds = ["user_id = %s", "is_recurring = 1", "(occurrences_until IS NULL OR occurrences_until < %s)", "due_date < %s"]
+    else:
+        conds = ["o.user_id = %s", "o.due_date >= %s AND o.due_date < %s", "t.occurrences_until >= %s"]
+    if text_mode == "fulltext":
+        conds.append("(MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) OR title LIKE %s OR description LIKE %s)")
+    elif text_mode == "like":
+        conds.append("(title LIKE %s OR description LIKE %s)")
+    if has_status:
+        conds.append("status = %s")
+    if n_tags:
+        # Tasks having all of the (distinct) tags, found through the task_tags index
+        id_column = "t.id" if kind == "occurrences" else "id"
+        conds.append(
+            f"{id_column} IN (SELECT task_id FROM task_tags WHERE tag IN ({', '.join(['%s'] * n_tags)}) "
+            f"GROUP BY task_id HAVING COUNT(*) = {n_tags})"
+        )
+    if kind == "occurrences":
+        columns = ", ".join("o.due_date" if col == "due_date" else f"t.{col}" for col in _TASK_COLUMNS)
+        return f"SELECT {columns} FROM task_occurrences o JOIN tasks t ON t.id = o.task_id WHERE {' AND '.join(conds)}"
+    return f"SELECT {', '.join(_TASK_COLUMNS)} FROM tasks WHERE {' AND '.join(conds)}"
+
+_TASK_QUERY_TEMPLATES = {
+    key: _build_task_query(*key)
+    for key in itertools.product(("single", "recurring", "occurrences"), (None, "fulltext", "like"), range(_MAX_TEMPLATE_TAGS + 1), (False, True), (False, True))
+}
+
+def _get_task_query(kind: str, text_mode: Optional[str], n_tags: int, has_status: bool, has_window: bool) -> str:
+    """Look up the query template, only building it for more tags than precompiled"""
+    key = (kind, text_mode, n_tags, has_status, has_window)
+    sql = _TASK_QUERY_TEMPLATES.get(key)
+    return sql if sql is not None else _build_task_query(*key)
+
+@functools.lru_cache(maxsize=128)
+def _get_update_query(columns: Tuple[str, ...], own: bool) -> str:
+    """Update query of a task setting the given columns, built once per combination of them. own restricts it to the requester's task."""
+    assignments = [f"{column} = %s" for column in columns]
+    if "due_date" in columns or "rrule" in columns:
+        assignments.append("occurrences_until = NULL")
+    return f"UPDATE tasks SET {', '.join(assignments)} WHERE id = %s{' AND user_id = %s' if own else ''}"
+
+def _validate_requester(api_key: str) -> Tuple[str, str]:
+    """
+    Validate the API key of a request on a single task, the task's owner is then checked with the statement on the task itself
+    instead of a separate lookup. Returns (user_id, user_role).
+    """
+    requester_id, requester_role, _ = utils.validate_api_key(api_key)
+    if not requester_id:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+    return requester_id, requester_role
+
+def _task_model(item: Dict[str, Any]) -> schemas.Task:
+    """Response model of a task row, built without validation as the columns already have the model types"""
+    item["status"] = schemas.TaskStatus(item["status"])
+    return schemas.Task.model_construct(**item)
+
+def _tag_keys(tags: List[str]) -> List[str]:
+    """Distinct tags as stored in task_tags"""
+    return list(dict.fromkeys(tag[:_MAX_TAG_LENGTH] for tag in tags))
+
+def _store_tags(cursor, task_id: int, tags: Optional[List[str]], replace: bool = True):
+    """Store the tags of a task in task_tags, the indexed copy of the tags column the tag filters query"""
+    if replace:
+        cursor.execute("DELETE FROM task_tags WHERE task_id = %s", (task_id,))
+    if tags:
+        cursor.executemany("INSERT INTO task_tags (task_id, tag) VALUES (%s, %s)", [(task_id, tag) for tag in _tag_keys(tags)])
+
+def _store_occurrences(tasks: List[Tuple[int, str, Optional[datetime.datetime], Optional[str]]]):
+    """
+    Expand the rrules of tasks given as (task_id, user_id, due_date, rrule) and store their occurrences in task_occurrences,
+    replacing any stored before. All tasks are written with one statement per table.
+    occurrences_until stays NULL if there is nothing to store or the rrule can't be expanded here, so queries expand the task in Python.
+    """
+    if not tasks:
+        return
+    task_ids = [task[0] for task in tasks]
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    try:
+        horizon = datetime.datetime.now() + _OCCURRENCE_HORIZON
+        occurrence_rows = []
+        until_params = []
+        for task_id, user_id, due_date, rrule in tasks:
+            occurrences_until = None
+            if rrule and due_date is not None:
+                try:
+                    occurrences, next_occurrence = utils.expand_rrule(rrule, due_date, horizon, _MAX_STORED_OCCURRENCES)
+                    occurrences_until = next_occurrence or _OCCURRENCES_COMPLETE
+                    occurrence_rows.extend((task_id, user_id, occurrence) for occurrence in occurrences)
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Not storing occurrences of task {task_id}: {e}")
+            until_params.extend([task_id, occurrences_until])
+
+        ids_placeholders = ", ".join(["%s"] * len(task_ids))
+        conn.start_transaction()
+        cursor.execute(f"DELETE FROM task_occurrences WHERE task_id IN ({ids_placeholders})", tuple(task_ids))
+        if occurrence_rows:
+            # Sent as one multi-row INSERT
+            cursor.executemany("INSERT INTO task_occurrences (task_id, user_id, due_date) VALUES (%s, %s, %s)", occurrence_rows)
+        cursor.execute(
+            f"UPDATE tasks SET occurrences_until = CASE id {' '.join(['WHEN %s THEN %s'] * len(tasks))} END "
+            f"WHERE id IN ({ids_placeholders})",
+            tuple(until_params + task_ids)
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to store occurrences of tasks {task_ids}: {str(e)}")
+
 @router.post("/", response_model=schemas.TaskCreate)
-async def create_task(
+def create_task(
     title: str,
     description: Optional[str] = None,
     status: Optional[schemas.TaskStatus] = schemas.TaskStatus.PENDING,
@@ -38,7 +186,7 @@ async def create_task(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
+        database.get_connection().start_transaction()
 
         # Convert tags list to JSON
         tags_json = utils.list_to_json(tags) if tags else None
@@ -62,8 +210,12 @@ async def create_task(
 
         # Get the newly created task ID
         task_id = cursor.lastrowid
+        _store_tags(cursor, task_id, tags, replace=False)
         database.get_connection().commit()
 
+        if rrule:
+            _store_occurrences([(task_id, target_user_id, due_date_parsed, rrule)])
+
         logger.info(f"Created task '{title}' for user {target_user_id} with ID {task_id}")
 
         # Return the created task
@@ -82,37 +234,101 @@ async def create_task(
         logger.error(f"Failed to create task: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
 
+@router.post("/bulk", response_model=List[schemas.Task])
+def create_tasks_bulk(
+    tasks: List[schemas.TaskBulkCreate],
+    for_user: Optional[str] = None,
+    api_key: str = Header(..., alias="X-API-Key"),
+):
+    """Create multiple tasks with a single batched insert"""
+    target_user_id = utils.validate_user_for_action(api_key, for_user)
+
+    if not tasks:
+        return []
+
+    # Validate all due_dates before inserting anything
+    rows = []
+    for task in tasks:
+        due_date_parsed = None
+        if task.due_date:
+            due_date_parsed = utils.validate_time_format(task.due_date)
+            if due_date_parsed is None:
+                raise HTTPException(status_code=400, detail=f"Invalid due_date format: {task.due_date}")
+        status = task.status or schemas.TaskStatus.PENDING
+        rows.append((
+            target_user_id,
+            task.title,
+            task.description,
+            status.value,
+            due_date_parsed,
+            task.rrule,
+            utils.list_to_json(task.tags) if task.tags else None
+        ))
+
+    try:
+        cursor = database.get_cursor()
+
+        insert_query = """
+            INSERT INTO tasks 
+            (user_id, title, description, status, due_date, rrule, tags)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+
+        database.get_connection().start_transaction()
+
+        # Sent as one multi-row INSERT, InnoDB hands its rows consecutive ids starting at lastrowid
+        cursor.executemany(insert_query, rows)
+        first_id = cursor.lastrowid
+        tag_rows = [(first_id + i, tag) for i, task in enumerate(tasks) for tag in _tag_keys(task.tags or [])]
+        if tag_rows:
+            cursor.executemany("INSERT INTO task_tags (task_id, tag) VALUES (%s, %s)", tag_rows)
+        database.get_connection().commit()
+
+        _store_occurrences([(first_id + i, target_user_id, row[4], row[5]) for i, row in enumerate(rows) if row[5]])
+
+        logger.info(f"Created {len(rows)} tasks for user {target_user_id} starting with ID {first_id}")
+
+        return [
+            {
+                "id": first_id + i,
+                "user_id": target_user_id,
+                "title": row[1],
+                "description": row[2],
+                "status": row[3],
+                "due_date": row[4],
+                "rrule": row[5],
+                "tags": task.tags or [],
+            }
+            for i, (row, task) in enumerate(zip(rows, tasks))
+        ]
+
+    except Exception as e:
+        database.get_connection().rollback()
+        logger.error(f"Failed to create tasks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create tasks: {str(e)}")
+
 @router.get("/", response_model=List[schemas.Task])
-async def query_tasks(
+def query_tasks(
+    request: Request,
+    response: Response,
     search_text: Optional[str] = None,
     tags: Optional[List[str]] = Query(None),
     due_after: Optional[str] = None,
     due_before: Optional[str] = None,
     status: Optional[schemas.TaskStatus] = None,
     match_mode: Optional[str] = "and",
+    limit: Optional[int] = Query(None, ge=1),
     for_user: Optional[str] = None,
     api_key: str = Header(..., alias="X-API-Key"),
 ):
-    """Query tasks by text, tags, status, and/or due date with configurable match mode"""
+    """
+    Query tasks by text, tags, status, and/or due date with configurable match mode, optionally only the first `limit` by due date.
+    search_text matches tasks whose title or description contains it, or contains all of its words as word prefixes
+    (stopwords and words under three characters left out).
+    Responses carry an ETag, a request with a matching If-None-Match gets a 304 without running the query.
+    """
     requester_id = utils.validate_user_for_action(api_key, for_user)
 
-    # Local helper to ensure correct tag querying
-    def build_local_query_filters(search_text=None, tags=None, status=None):
-        conds, params = [], []
-        if search_text:
-            conds.append("(title LIKE %s OR description LIKE %s)")
-            params.extend([f"%{search_text}%", f"%{search_text}%"])
-        if status is not None:
-            conds.append("status = %s")
-            params.append(status.value if hasattr(status, 'value') else status)
-        if tags:
-            tag_conds = []
-            for t in tags:
-                tag_conds.append("JSON_CONTAINS(tags, %s)")
-                params.append(json.dumps(t))
-            conds.append(f"({' AND '.join(tag_conds)})")
-        return conds, params
-
     if not any([search_text, tags, due_after, due_before, status]):
         # To get all tasks, the user should provide a wide time window.
         # This prevents accidentally returning the entire task history.
@@ -134,51 +350,88 @@ async def query_tasks(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
+
+        # The result only changes with the user's tasks: the last update (to the microsecond), the newest id (for
+        # creates) and the count (for deletes) cover every write, also several within the same second
+        cursor.execute("SELECT MAX(updated_at), MAX(id), COUNT(*) FROM tasks WHERE user_id = %s", (requester_id,))
+        last_update, last_id, task_count = cursor.fetchone()
+        query_string = str(sorted(request.query_params.multi_items()))
+        etag = '"' + hashlib.blake2b(f"{requester_id}:{last_update}:{last_id}:{task_count}:{query_string}".encode(), digest_size=16).hexdigest() + '"'
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
 
         results = []
-        tt_conds, tt_params = build_local_query_filters(search_text, tags, status)
+
+        # Filter params in the order of the conditions in the query templates
+        text_mode, tt_params = None, []
+        if search_text:
+            # Word prefixes through the fulltext index and the text as a substring, LIKE alone if no word is indexed
+            fulltext_query = utils.to_fulltext_query(search_text)
+            like = f"%{search_text}%"
+            if fulltext_query:
+                text_mode, tt_params = "fulltext", [fulltext_query, like, like]
+            else:
+                text_mode, tt_params = "like", [like, like]
+        if status is not None:
+            tt_params.append(status.value)
+        tag_keys = _tag_keys(tags) if tags else []
+        n_tags = len(tag_keys)
+        tt_params.extend(tag_keys)
 
         # Non-recurring tasks
-        base_conds = ["user_id = %s", "(rrule IS NULL OR rrule = '')"]
         base_params = [requester_id]
         if has_time_window:
-            base_conds.append("due_date IS NOT NULL AND due_date <= %s AND due_date >= %s")
             base_params.extend([end_dt, start_dt])
-        
-        base_conds.extend(tt_conds)
         base_params.extend(tt_params)
 
-        sql = f"SELECT id, user_id, title, description, status, due_date, rrule, tags FROM tasks WHERE {' AND '.join(base_conds)}"
+        sql = _get_task_query("single", text_mode, n_tags, status is not None, has_time_window) + " ORDER BY due_date, id"
+        if limit is not None:
+            sql += " LIMIT %s"
+            base_params.append(limit)
         cursor.execute(sql, tuple(base_params))
         
-        rows = cursor.fetchall()
-        cols = [d[0] for d in cursor.description]
-        items = [{col: row[i] for i, col in enumerate(cols)} for row in rows]
-        for item in items:
-            if isinstance(item.get("tags"), str):
-                try: item["tags"] = json.loads(item["tags"])
-                except (json.JSONDecodeError, TypeError): item["tags"] = []
-        results.extend(items)
+        for row in database.iter_rows(cursor):
+            item = dict(zip(_TASK_COLUMNS, row))
+            item["tags"] = utils.parse_tags(item["tags"])
+            results.append(item)
 
         # Recurring tasks
         if has_time_window:
-            rec_conds = ["user_id = %s", "(rrule IS NOT NULL AND rrule <> '')"]
-            rec_params = [requester_id]
-            rec_conds.extend(tt_conds)
+            # Stored occurrences of the tasks they cover the window for
+            stored_until = min(end_dt, _OCCURRENCES_COMPLETE)
+            occ_params = [requester_id, start_dt, end_dt, stored_until]
+            occ_params.extend(tt_params)
+
+            sql_occ = _get_task_query("occurrences", text_mode, n_tags, status is not None, False) + " ORDER BY o.due_date, t.id"
+            if limit is not None:
+                sql_occ += " LIMIT %s"
+                occ_params.append(limit)
+            cursor.execute(sql_occ, tuple(occ_params))
+
+            stored_results = []
+            for row in database.iter_rows(cursor):
+                item = dict(zip(_TASK_COLUMNS, row))
+                item["tags"] = utils.parse_tags(item["tags"]) or []
+                stored_results.append(item)
+
+            # The others are expanded here
+            rec_params = [requester_id, stored_until, end_dt]
             rec_params.extend(tt_params)
-            
-            sql_rec = f"SELECT id, user_id, title, description, status, due_date, rrule, tags FROM tasks WHERE {' AND '.join(rec_conds)}"
+
+            sql_rec = _get_task_query("recurring", text_mode, n_tags, status is not None, False)
             cursor.execute(sql_rec, tuple(rec_params))
             
-            rec_rows = cursor.fetchall()
             rec_tasks_for_expansion = []
             id_to_status = {}
-            for row in rec_rows:
-                task = {col: row[i] for i, col in enumerate(cols)}
-                if isinstance(task.get("tags"), str):
-                    try: task["tags"] = json.loads(task["tags"])
-                    except (json.JSONDecodeError, TypeError): task["tags"] = []
+            for row in database.iter_rows(cursor):
+                task = dict(zip(_TASK_COLUMNS, row))
+                # Rules that ended before the window have nothing to expand (a day of slack for an UTC UNTIL)
+                until = utils.rrule_until(task["rrule"])
+                if until is not None and until < start_dt - datetime.timedelta(days=1):
+                    continue
+                task["tags"] = utils.parse_tags(task["tags"])
                 
                 if task.get("id") is not None:
                     id_to_status[int(task["id"])] = task.get("status")
@@ -190,20 +443,31 @@ async def query_tasks(
                     "rrule": task.get("rrule"), "tags": task.get("tags") or [],
                 })
             
-            occurrences = utils.handle_rrule_query(rec_tasks_for_expansion, start_dt, end_dt)
+            if limit is None:
+                occurrences = utils.handle_rrule_query(rec_tasks_for_expansion, start_dt, end_dt)
+            else:
+                # Only the first `limit` occurrences can end up in the result, stop expanding after those
+                merged = utils.iter_rrule_occurrences(rec_tasks_for_expansion, start_dt, end_dt)
+                occurrences = [occ for _, occ in itertools.islice(merged, limit)]
             
+            # Occurrences come ordered by start and id
+            expanded_results = []
             for occ in occurrences:
                 occ_id = occ.get("id")
                 occ_status = id_to_status.get(int(occ_id)) if occ_id is not None else schemas.TaskStatus.PENDING.value
-                results.append({
+                expanded_results.append({
                     "id": occ_id, "user_id": occ.get("user_id"),
                     "title": occ.get("title"), "description": occ.get("description"),
                     "status": occ_status, "due_date": occ.get("start_datetime"),
                     "rrule": occ.get("rrule"), "tags": occ.get("tags") or [],
                 })
 
-        # Final sort and return
-        results.sort(key=lambda x: (x.get("due_date") or datetime.datetime.min, x.get("id") or 0))
+            # Within a time window every task has a due date, so the ordered parts can be merged
+            results = heapq.merge(results, stored_results, expanded_results, key=_TASK_ORDER)
+
+        if limit is not None:
+            results = itertools.islice(results, limit)
+        results = [_task_model(item) for item in results]
         logger.info(f"Found {len(results)} tasks for user {requester_id}")
         return results
 
@@ -215,36 +479,26 @@ async def query_tasks(
 
 
 @router.get("/{entry_id}", response_model=schemas.Task)
-async def get_task(
+def get_task(
     entry_id: int,
     api_key: str = Header(..., alias="X-API-Key"),
 ):
     """Get a single task by query id"""
-    utils.validate_entry_access(api_key, utils.ResourceType.TASK, entry_id)
+    requester_id, requester_role = _validate_requester(api_key)
 
     try:
-        cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
-
-        cursor.execute("SELECT * FROM tasks WHERE id = %s", (entry_id,))
+        cursor = database.get_prepared_cursor(_SELECT_TASK_BY_ID)
+        cursor.execute(_SELECT_TASK_BY_ID, (entry_id,))
         result = cursor.fetchone()
 
-        if not result:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        # Get column names
-        columns = [desc[0] for desc in cursor.description]
-        task_dict = dict(zip(columns, result))
+        task_dict = dict(zip(_TASK_COLUMNS, result)) if result else {}
+        utils.check_entry_owner(requester_id, requester_role, utils.ResourceType.TASK, task_dict.get("user_id"))
 
         # Parse JSON tags field
-        if task_dict.get("tags"):
-            try:
-                task_dict["tags"] = json.loads(task_dict["tags"])
-            except (json.JSONDecodeError, TypeError):
-                task_dict["tags"] = []
+        task_dict["tags"] = utils.parse_tags(task_dict["tags"])
 
         logger.info(f"Retrieved task {entry_id}")
-        return task_dict
+        return _task_model(task_dict)
 
     except HTTPException:
         raise
@@ -253,7 +507,7 @@ async def get_task(
         raise HTTPException(status_code=500, detail=f"Failed to retrieve task {entry_id}: {str(e)}")
 
 @router.put("/{entry_id}", response_model=schemas.Task)
-async def update_task(
+def update_task(
     entry_id: int,
     title: Optional[str] = None,
     description: Optional[str] = None,
@@ -264,7 +518,7 @@ async def update_task(
     api_key: str = Header(..., alias="X-API-Key"),
 ):
     """Update an existing task"""
-    utils.validate_entry_access(api_key, utils.ResourceType.TASK, entry_id)
+    requester_id, requester_role = _validate_requester(api_key)
 
     # Validate due_date format if provided
     due_date_parsed = None
@@ -278,68 +532,74 @@ async def update_task(
 
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
-
-        # First check if task exists
-        cursor.execute("SELECT * FROM tasks WHERE id = %s", (entry_id,))
-        current_task = cursor.fetchone()
-
-        if not current_task:
-            raise HTTPException(status_code=404, detail="Task not found")
 
         # Prepare update values
-        update_fields = []
+        update_columns = []
         update_values = []
 
         if title is not None:
-            update_fields.append("title = %s")
+            update_columns.append("title")
             update_values.append(title)
 
         if description is not None:
-            update_fields.append("description = %s")
+            update_columns.append("description")
             update_values.append(description)
 
         if status is not None:
-            update_fields.append("status = %s")
+            update_columns.append("status")
             update_values.append(status.value)
 
         if due_date is not None:
-            update_fields.append("due_date = %s")
+            update_columns.append("due_date")
             update_values.append(due_date_parsed)
 
         if rrule is not None:
-            update_fields.append("rrule = %s")
+            update_columns.append("rrule")
             update_values.append(rrule)
 
+        # Stored occurrences are outdated once the schedule changes, until they are stored again below
+        reschedule = due_date is not None or rrule is not None
+
         if tags is not None:
-            update_fields.append("tags = %s")
+            update_columns.append("tags")
             update_values.append(utils.list_to_json(tags))
 
-        if not update_fields:
+        if not update_columns:
             raise HTTPException(status_code=400, detail="No fields to update provided")
 
-        # Build and execute update query
-        update_query = f"UPDATE tasks SET {', '.join(update_fields)} WHERE id = %s"
+        # Look up the update query of this combination of columns, users can only update their own tasks
+        own = requester_role != 'admin'
+        update_query = _get_update_query(tuple(update_columns), own)
         update_values.append(entry_id)
+        if own:
+            update_values.append(requester_id)
 
+        if tags is not None:
+            database.get_connection().start_transaction()
         cursor.execute(update_query, update_values)
+        if cursor.rowcount == 0:
+            # Nothing matched, find out why
+            database.get_connection().rollback()
+            utils.validate_entry_access(api_key, utils.ResourceType.TASK, entry_id)
+            raise HTTPException(status_code=404, detail="Task not found")
+        if tags is not None:
+            _store_tags(cursor, entry_id, tags)
         database.get_connection().commit()
 
         # Get updated task
-        cursor.execute("SELECT * FROM tasks WHERE id = %s", (entry_id,))
-        result = cursor.fetchone()
-        columns = [desc[0] for desc in cursor.description]
-        task_dict = dict(zip(columns, result))
+        select_cursor = database.get_prepared_cursor(_SELECT_TASK_BY_ID)
+        select_cursor.execute(_SELECT_TASK_BY_ID, (entry_id,))
+        result = select_cursor.fetchone()
+        task_dict = dict(zip(_TASK_COLUMNS, result))
 
         # Parse JSON tags field
-        if task_dict.get("tags"):
-            try:
-                task_dict["tags"] = json.loads(task_dict["tags"])
-            except (json.JSONDecodeError, TypeError):
-                task_dict["tags"] = []
+        task_dict["tags"] = utils.parse_tags(task_dict["tags"])
+
+        if reschedule and (task_dict["rrule"] or rrule is not None):
+            _store_occurrences([(entry_id, task_dict["user_id"], task_dict["due_date"], task_dict["rrule"])])
 
         logger.info(f"Updated task {entry_id}")
-        return task_dict
+        return _task_model(task_dict)
 
     except HTTPException:
         raise
@@ -349,24 +609,25 @@ async def update_task(
         raise HTTPException(status_code=500, detail=f"Failed to update task {entry_id}: {str(e)}")
 
 @router.delete("/{entry_id}", response_model=schemas.MessageResponse)
-async def delete_task(
+def delete_task(
     entry_id: int,
     api_key: str = Header(..., alias="X-API-Key"),
 ):
     """Delete a specific task"""
-    utils.validate_entry_access(api_key, utils.ResourceType.TASK, entry_id)
+    requester_id, requester_role = _validate_requester(api_key)
 
     try:
-        cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
-
-        # Check if task exists
-        cursor.execute("SELECT id FROM tasks WHERE id = %s", (entry_id,))
-        if not cursor.fetchone():
+        # Delete the task, users only their own
+        if requester_role == 'admin':
+            cursor = database.get_prepared_cursor(_DELETE_TASK_BY_ID)
+            cursor.execute(_DELETE_TASK_BY_ID, (entry_id,))
+        else:
+            cursor = database.get_prepared_cursor(_DELETE_OWN_TASK_BY_ID)
+            cursor.execute(_DELETE_OWN_TASK_BY_ID, (entry_id, requester_id))
+        if cursor.rowcount == 0:
+            # Nothing deleted, find out why
+            utils.validate_entry_access(api_key, utils.ResourceType.TASK, entry_id)
             raise HTTPException(status_code=404, detail="Task not found")
-
-        # Delete the task
-        cursor.execute("DELETE FROM tasks WHERE id = %s", (entry_id,))
         database.get_connection().commit()
 
         logger.info(f"Deleted task {entry_id}")
@@ -377,4 +638,28 @@ async def delete_task(
     except Exception as e:
         database.get_connection().rollback()
         logger.error(f"Failed to delete task {entry_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to delete task {entry_id}: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to delete task {entry_id}: {str(e)}")
+
+@router.post("/bulk-delete", response_model=schemas.MessageResponse)
+def delete_tasks_bulk(
+    ids: List[int] = Body(..., embed=True),
+    api_key: str = Header(..., alias="X-API-Key"),
+):
+    """Delete several tasks with one statement, none of them if any is missing or not the requester's"""
+    utils.validate_entry_access_batch(api_key, utils.ResourceType.TASK, ids)
+
+    if not ids:
+        return {"message": "No tasks deleted"}
+
+    try:
+        cursor = database.get_cursor()
+        cursor.execute(f"DELETE FROM tasks WHERE id IN ({', '.join(['%s'] * len(ids))})", tuple(ids))
+        database.get_connection().commit()
+
+        logger.info(f"Deleted tasks {ids}")
+        return {"message": f"Deleted {cursor.rowcount} tasks"}
+
+    except Exception as e:
+        database.get_connection().rollback()
+        logger.error(f"Failed to delete tasks {ids}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete tasks: {str(e)}")
@@ -10,8 +10,13 @@ import schemas
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Hot single-row statements, executed as server-side prepared statements
+_SELECT_USER_BY_ID = "SELECT id, role, utc_offset_minutes, created_at, updated_at FROM users WHERE id = %s"
+_UPDATE_USER_OFFSET = "UPDATE users SET utc_offset_minutes = %s WHERE id = %s"
+_DELETE_USER_BY_ID = "DELETE FROM users WHERE id = %s AND role <> 'admin'"
+
 @router.post("/", response_model=schemas.UserCreateResponse)
-async def create_user(
+def create_user(
     api_key: str = Header(..., alias="X-API-Key")
 ):
     """Create a new user (by admin only)"""
@@ -22,7 +27,6 @@ async def create_user(
     
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
 
         # Generate new user credentials
         new_user_id = utils.generate_user_id()
@@ -49,7 +53,7 @@ async def create_user(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/", response_model=List[schemas.User])
-async def list_users(
+def list_users(
     api_key: str = Header(..., alias="X-API-Key")
 ):
     """List all users (admin only)"""
@@ -60,17 +64,13 @@ async def list_users(
     
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
         cursor.execute("SELECT id, role, created_at, updated_at FROM users")
         
-        users = []
-        for row in cursor.fetchall():
-            users.append({
-                "id": row[0],
-                "role": row[1],
-                "created_at": row[2].isoformat() if row[2] else None,
-                "updated_at": row[3].isoformat() if row[3] else None
-            })
+        # Rows come with the model's types, so the models are built without validating them again
+        users = [
+            schemas.User.model_construct(id=row[0], role=row[1], created_at=row[2], updated_at=row[3])
+            for row in cursor.fetchall()
+        ]
         
         return users
         
@@ -79,7 +79,7 @@ async def list_users(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/{user_id}", response_model=schemas.UserWithOffset)
-async def get_user(
+def get_user(
     user_id: str,
     api_key: str = Header(..., alias="X-API-Key")
 ):
@@ -90,12 +90,8 @@ async def get_user(
         raise HTTPException(status_code=403, detail="Access denied")
     
     try:
-        cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
-        cursor.execute(
-            "SELECT id, role, utc_offset_minutes, created_at, updated_at FROM users WHERE id = %s",
-            (user_id,)
-        )
+        cursor = database.get_prepared_cursor(_SELECT_USER_BY_ID)
+        cursor.execute(_SELECT_USER_BY_ID, (user_id,))
         
         result = cursor.fetchone()
         if not result:
@@ -116,7 +112,7 @@ async def get_user(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.put("/{user_id}", response_model=schemas.MessageResponse)
-async def update_user(
+def update_user(
     user_id: str,
     utc_offset_minutes: int,
     api_key: str = Header(..., alias="X-API-Key")
@@ -128,14 +124,10 @@ async def update_user(
         raise HTTPException(status_code=403, detail="Access denied")
     
     try:
-        cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
+        cursor = database.get_prepared_cursor(_UPDATE_USER_OFFSET)
 
         # Update user
-        cursor.execute(
-            "UPDATE users SET utc_offset_minutes = %s WHERE id = %s",
-            (utc_offset_minutes, user_id)
-        )
+        cursor.execute(_UPDATE_USER_OFFSET, (utc_offset_minutes, user_id))
         database.get_connection().commit()
         
         return {"message": "User updated successfully"}
@@ -147,7 +139,7 @@ async def update_user(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/{user_id}/reroll", response_model=schemas.ApiKeyRerollResponse)
-async def reroll_api_key(
+def reroll_api_key(
     user_id: str,
     api_key: str = Header(..., alias="X-API-Key")
 ):
@@ -160,7 +152,6 @@ async def reroll_api_key(
     
     try:
         cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
         
         # Ensure target user exists
         cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
@@ -175,6 +166,7 @@ async def reroll_api_key(
             (new_api_key_hash, user_id)
         )
         database.get_connection().commit()
+        utils.invalidate_api_key_cache(user_id)
         
         logger.info(f"API key rerolled for user: {user_id}")
         return {
@@ -190,7 +182,7 @@ async def reroll_api_key(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.delete("/{user_id}", response_model=schemas.MessageResponse)
-async def delete_user(
+def delete_user(
     user_id: str,
     api_key: str = Header(..., alias="X-API-Key")
 ):
@@ -201,19 +193,18 @@ async def delete_user(
         raise HTTPException(status_code=403, detail="Access denied")
  
     try:
-        cursor = database.get_cursor()
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
-        # Prevent deletion of admin users
-        cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
-        result = cursor.fetchone()
-        if not result:
-            raise HTTPException(status_code=404, detail="User not found")
-        if result[0] == 'admin':
+        cursor = database.get_prepared_cursor(_DELETE_USER_BY_ID)
+        # Delete user unless admin (cascade will handle related data)
+        cursor.execute(_DELETE_USER_BY_ID, (user_id,))
+        if cursor.rowcount == 0:
+            # Nothing deleted, find out why
+            cursor = database.get_cursor()
+            cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="User not found")
             raise HTTPException(status_code=403, detail="Admin users cannot be deleted")
-         
-         # Delete user (cascade will handle related data)
-        cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         database.get_connection().commit()
+        utils.invalidate_api_key_cache(user_id)
         
         logger.info(f"User deleted: {user_id}")
         return {"message": "User deleted successfully"}
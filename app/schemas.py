@@ -78,6 +78,16 @@ class TaskCreate(BaseModel):
     tags: Optional[List[str]] = []
 
 
+# Task of a bulk create, owned by the requesting (or for_user) user
+class TaskBulkCreate(BaseModel):
+    title: str
+    description: Optional[str] = None
+    status: Optional[TaskStatus] = TaskStatus.PENDING
+    due_date: Optional[str] = None
+    rrule: Optional[str] = None
+    tags: Optional[List[str]] = []
+
+
 class MessageResponse(BaseModel):
     message: str
 
@@ -116,6 +126,7 @@ class Note(BaseModel):
     title: str
     content: str
     tags: Optional[List[str]] = []
+    is_log: bool = False
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -124,9 +135,16 @@ class NoteCreate(BaseModel):
     title: str
     content: str
     tags: Optional[List[str]] = []
+    # Append-only log of a client, not found by content search
+    is_log: bool = False
 
 
 class NoteUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     tags: Optional[List[str]] = []
+    is_log: Optional[bool] = None
+
+
+class NoteAppend(BaseModel):
+    content: str
@@ -5,6 +5,80 @@ import database
 
 logger = logging.getLogger(__name__)
 
+# Columns and indexes on top of the base tables as (table, name, definition). Kept apart from the
+# CREATE TABLE statements so they also get added to databases created by older versions.
+SCHEMA_COLUMNS = [
+    # Recurring flag of a task, so queries can filter on an indexable column instead of the rrule text
+    ("tasks", "is_recurring", "is_recurring BOOLEAN GENERATED ALWAYS AS (rrule IS NOT NULL AND rrule <> '') STORED NOT NULL"),
+    # Bound up to which the occurrences of a recurring task are stored in task_occurrences, NULL if they are not
+    ("tasks", "occurrences_until", "occurrences_until DATETIME NULL"),
+    # Notes written as append-only logs by a client (like the bot's chat histories), kept out of the content search
+    ("notes", "is_log", "is_log BOOLEAN NOT NULL DEFAULT FALSE"),
+    # Content of a note as the content search sees it, empty for logs. The fulltext index is on this column, so
+    # appending to a log doesn't re-tokenize the whole log and its machine written text never reaches the index.
+    ("notes", "search_content", "search_content MEDIUMTEXT GENERATED ALWAYS AS (IF(is_log, '', content)) STORED NOT NULL"),
+]
+
+# Columns of the base tables whose type changed as (table, name, column type, definition), modified where they differ
+SCHEMA_COLUMN_TYPES = [
+    # The task query ETag is built from the latest update, whole seconds would miss two changes within one second
+    ("tasks", "updated_at", "datetime(6)",
+     "updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"),
+]
+
+# Tables added after the base tables as (table, definition, statement filling it from existing rows or None)
+SCHEMA_TABLES = [
+    # Stored occurrences of recurring tasks, so queries read them with a range scan instead of expanding the rrule
+    ("task_occurrences", """
+        CREATE TABLE IF NOT EXISTS task_occurrences (
+            task_id              INT          NOT NULL,
+            user_id              CHAR(8)      NOT NULL,
+            due_date             DATETIME     NOT NULL,
+            PRIMARY KEY (task_id, due_date),
+            INDEX idx_task_occurrences_user_due (user_id, due_date),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        )
+        """, None),
+    # Tags of tasks one per row, so tag filters are index lookups instead of JSON_CONTAINS on every row
+    ("task_tags", """
+        CREATE TABLE IF NOT EXISTS task_tags (
+            task_id              INT          NOT NULL,
+            tag                  VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+            PRIMARY KEY (task_id, tag),
+            INDEX idx_task_tags_tag (tag, task_id),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        )
+        """, """
+        INSERT IGNORE INTO task_tags (task_id, tag)
+        SELECT tasks.id, LEFT(jt.tag, 255) FROM tasks,
+            JSON_TABLE(tasks.tags, '$[*]' COLUMNS (tag TEXT PATH '$')) AS jt
+        WHERE jt.tag IS NOT NULL
+        """),
+]
+
+SCHEMA_INDEXES = [
+    # API key check on every request: users by key hash
+    ("users", "idx_users_api_key_hash", "INDEX idx_users_api_key_hash (api_key_hash)"),
+    # Serves both partitions of the task query: user, recurring or not, then due date range
+    ("tasks", "idx_tasks_user_rec_due", "INDEX idx_tasks_user_rec_due (user_id, is_recurring, due_date)"),
+    # Text search on tasks, queried with MATCH ... AGAINST instead of a leading wildcard LIKE
+    ("tasks", "ft_tasks_text", "FULLTEXT ft_tasks_text (title, description)"),
+    # Change check of the task query ETag: latest update of a user's tasks
+    ("tasks", "idx_tasks_user_updated", "INDEX idx_tasks_user_updated (user_id, updated_at)"),
+    # Calendar window queries: user, then start range
+    ("calendar_entries", "idx_calendar_user_start", "INDEX idx_calendar_user_start (user_id, start_datetime)"),
+    # Text search on calendar entries and notes, same as on tasks
+    ("calendar_entries", "ft_calendar_text", "FULLTEXT ft_calendar_text (title, description)"),
+    ("notes", "ft_notes_title", "FULLTEXT ft_notes_title (title)"),
+    ("notes", "ft_notes_search_content", "FULLTEXT ft_notes_search_content (search_content)"),
+]
+
+# Indexes of older versions that have been replaced, as (table, name)
+OBSOLETE_INDEXES = [
+    ("tasks", "idx_tasks_user_rrule_due"),
+    ("notes", "ft_notes_content"),
+]
+
 
 def check_db_is_setup():
     """Check if the organizr database exists and contains all required tables."""
@@ -133,6 +207,63 @@ def create_db_and_scheme():
 
     database.get_connection().commit()
 
+    migrate_schema()
+
+
+def migrate_schema():
+    """Add any tables, columns and indexes of the current schema that are missing from the organizr database, and drop replaced indexes."""
+    db_cursor = database.get_cursor()
+
+    for table, definition, populate in SCHEMA_TABLES:
+        db_cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
+            (database.MYSQL_DATABASE, table)
+        )
+        if db_cursor.fetchone()[0] == 0:
+            logger.info(f"Adding table {table}")
+            db_cursor.execute(definition)
+            if populate:
+                db_cursor.execute(populate)
+
+    for table, column_name, definition in SCHEMA_COLUMNS:
+        db_cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.columns WHERE table_schema = %s AND table_name = %s AND column_name = %s",
+            (database.MYSQL_DATABASE, table, column_name)
+        )
+        if db_cursor.fetchone()[0] == 0:
+            logger.info(f"Adding column {column_name} to table {table}")
+            db_cursor.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+
+    for table, column_name, column_type, definition in SCHEMA_COLUMN_TYPES:
+        db_cursor.execute(
+            "SELECT column_type FROM information_schema.columns WHERE table_schema = %s AND table_name = %s AND column_name = %s",
+            (database.MYSQL_DATABASE, table, column_name)
+        )
+        row = db_cursor.fetchone()
+        if row is not None and row[0].lower() != column_type:
+            logger.info(f"Changing column {column_name} of table {table} to {column_type}")
+            db_cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {definition}")
+
+    for table, index_name in OBSOLETE_INDEXES:
+        db_cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = %s AND table_name = %s AND index_name = %s",
+            (database.MYSQL_DATABASE, table, index_name)
+        )
+        if db_cursor.fetchone()[0] > 0:
+            logger.info(f"Dropping index {index_name} from table {table}")
+            db_cursor.execute(f"ALTER TABLE {table} DROP INDEX {index_name}")
+
+    for table, index_name, definition in SCHEMA_INDEXES:
+        db_cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = %s AND table_name = %s AND index_name = %s",
+            (database.MYSQL_DATABASE, table, index_name)
+        )
+        if db_cursor.fetchone()[0] == 0:
+            logger.info(f"Adding index {index_name} to table {table}")
+            db_cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+
+    database.get_connection().commit()
+
 
 def create_admin_user():
     """Create the initial admin user and log credentials."""
@@ -146,7 +277,6 @@ def create_admin_user():
     api_key_hash = utils.hash_api_key(admin_api_key)
 
     # Insert admin user into database
-    db_cursor.execute(f"USE {database.MYSQL_DATABASE}")
     db_cursor.execute(
         "INSERT INTO users (id, api_key_hash, role) VALUES (%s, %s, 'admin')",
         (admin_id, api_key_hash)
@@ -181,6 +311,7 @@ def setup_database():
         return True
     else:
         logger.info("Database is already set up.")
+        migrate_schema()
 
         database.get_connection().commit()
 
@@ -1,13 +1,22 @@
 # Shared tility functions for the organizr api
 
+import functools
 import hashlib
+import os
+import heapq
+import re
 import secrets
 import string
+import threading
+import time
 import logging
 import database
 from dateutil import parser
+from dateutil.rrule import rrulestr
 import json
-from typing import Optional, List, Dict, Any
+import orjson
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from fastapi import HTTPException
 import datetime
 from enum import Enum
@@ -16,14 +25,69 @@ import recurring_ical_events
 
 logger = logging.getLogger(__name__)
 
+# UNTIL part of an RRULE, date or date-time form
+_RRULE_UNTIL_RE = re.compile(r"UNTIL=(\d{8})(?:T(\d{6}))?", re.IGNORECASE)
+
+# Words shorter than this are not in an InnoDB fulltext index (innodb_ft_min_token_size default)
+FULLTEXT_MIN_WORD_LENGTH = 3
+
+# Words InnoDB leaves out of fulltext indexes (INNODB_FT_DEFAULT_STOPWORD), a required one would match nothing
+FULLTEXT_STOPWORDS = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how", "i", "in", "is", "it",
+    "la", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "who", "will", "with", "und",
+    "www",
+))
+
+# Users of recently checked API keys as hash -> (checked at, user_id, role), so most requests skip the users lookup.
+# Kept per process: a key changed or deleted by another worker stays valid there for up to API_KEY_CACHE_TTL seconds.
+# Set API_KEY_CACHE_TTL=0 to look up every request.
+API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_CACHE_SIZE = 4096
+_api_key_cache: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+_api_key_cache_lock = threading.Lock()
+
+# Occurrences of recently expanded recurring events as key -> (expanded at, occurrences), as calendar clients poll the same windows.
+# The key holds every field of the event that ends up in its occurrences, so an event changed since is expanded again.
+# Set EXPANSION_CACHE_TTL=0 to expand every request.
+EXPANSION_CACHE_TTL = int(os.getenv("EXPANSION_CACHE_TTL", "60"))
+EXPANSION_CACHE_SIZE = 1024
+_expansion_cache: "OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_expansion_cache_lock = threading.Lock()
+
+# Lookup of uncached API keys, executed as a server-side prepared statement
+_SELECT_USER_BY_KEY_HASH = "SELECT id, role FROM users WHERE api_key_hash = %s"
+
 class ResourceType(str, Enum):
     CALENDAR = "calendar"
     TASK = "task"
     NOTE = "note"
 
+# Mysql table of each resource type and the owner lookup of a single entry
+_ENTRY_TABLES = {
+    ResourceType.CALENDAR: "calendar_entries",
+    ResourceType.TASK: "tasks",
+    ResourceType.NOTE: "notes",
+}
+_ENTRY_OWNER_SQL = {resource_type: f"SELECT id, user_id FROM {table} WHERE id = %s" for resource_type, table in _ENTRY_TABLES.items()}
+# Whether a single entry exists and the user may access it, params (id, user_id, role)
+_ENTRY_ACCESS_SQL = {
+    resource_type: f"SELECT COUNT(*) FROM {table} WHERE id = %s AND (user_id = %s OR %s = 'admin')"
+    for resource_type, table in _ENTRY_TABLES.items()
+}
+
+_USER_ID_ALPHABET = string.ascii_letters + string.digits
+_USER_ID_LENGTH = 8
+_USER_ID_SPACE = len(_USER_ID_ALPHABET) ** _USER_ID_LENGTH
+
 def generate_user_id():
     """Generate a random 8-character alphanumeric user ID"""
-    return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(8))
+    # One random number for the whole ID instead of a secrets.choice per character, its digits in base 62 are the characters
+    value = secrets.randbelow(_USER_ID_SPACE)
+    chars = []
+    for _ in range(_USER_ID_LENGTH):
+        value, index = divmod(value, len(_USER_ID_ALPHABET))
+        chars.append(_USER_ID_ALPHABET[index])
+    return ''.join(chars)
 
 def generate_api_key():
     """Generate a random API key"""
@@ -31,6 +95,8 @@ def generate_api_key():
 
 def hash_api_key(api_key):
     """Hash an API key using SHA-256 for storage"""
+    # hashlib's SHA-256 runs in OpenSSL with the CPU's SHA extensions, for a key this short it is as fast as BLAKE2b.
+    # Stored hashes can't be migrated to another algorithm, the keys themselves are never stored.
     return hashlib.sha256(api_key.encode()).hexdigest()
 
 def validate_api_key(api_key, target_user_id=None):
@@ -48,12 +114,7 @@ def validate_api_key(api_key, target_user_id=None):
         - has_permission: True if user has rights over target_user_id
     """
     try:
-        cursor = database.get_cursor()
-        api_key_hash = hash_api_key(api_key)
-        
-        cursor.execute(f"USE {database.MYSQL_DATABASE}")
-        cursor.execute("SELECT id, role FROM users WHERE api_key_hash = %s", (api_key_hash,))
-        result = cursor.fetchone()
+        result = _lookup_api_key(hash_api_key(api_key))
         
         if not result:
             return None, None, False
@@ -71,6 +132,37 @@ def validate_api_key(api_key, target_user_id=None):
         logger.error(f"Error validating API key: {e}")
         return None, None, False
 
+def _lookup_api_key(api_key_hash: str) -> Optional[Tuple[str, str]]:
+    """Get (user_id, role) of an API key hash, from the cache if it was looked up within API_KEY_CACHE_TTL seconds"""
+    now = time.monotonic()
+    with _api_key_cache_lock:
+        cached = _api_key_cache.get(api_key_hash)
+        if cached is not None and now - cached[0] < API_KEY_CACHE_TTL:
+            _api_key_cache.move_to_end(api_key_hash)
+            return cached[1], cached[2]
+
+    cursor = database.get_prepared_cursor(_SELECT_USER_BY_KEY_HASH)
+    cursor.execute(_SELECT_USER_BY_KEY_HASH, (api_key_hash,))
+    result = cursor.fetchone()
+    if not result:
+        # Unknown keys are not cached, a key is usable as soon as it is stored
+        return None
+    if API_KEY_CACHE_TTL <= 0:
+        return result[0], result[1]
+
+    with _api_key_cache_lock:
+        _api_key_cache[api_key_hash] = (now, result[0], result[1])
+        _api_key_cache.move_to_end(api_key_hash)
+        if len(_api_key_cache) > API_KEY_CACHE_SIZE:
+            _api_key_cache.popitem(last=False)
+    return result[0], result[1]
+
+def invalidate_api_key_cache(user_id: str):
+    """Drop the cached API keys of a user, after its key was replaced or the user deleted"""
+    with _api_key_cache_lock:
+        for api_key_hash in [h for h, (_, cached_user_id, _) in _api_key_cache.items() if cached_user_id == user_id]:
+            del _api_key_cache[api_key_hash]
+
 def validate_user_for_action(api_key: str, for_user: Optional[str] = None):
     """
     Validates API key and permissions for a user to perform an action on another user's resources.
@@ -117,35 +209,84 @@ def validate_entry_access(api_key: str, resource_type: ResourceType, resource_id
     Raises:
         HTTPException: If validation fails.
     """
+    return validate_entry_access_batch(api_key, resource_type, [resource_id])
+
+def validate_entry_access_batch(api_key: str, resource_type: ResourceType, resource_ids: List[int]):
+    """
+    Validates if a user has permission to access several resource entries, looking up all of their owners with one query.
+
+    Args:
+        api_key (str): The API key of the user.
+        resource_type (ResourceType): The type of the resources.
+        resource_ids (List[int]): The IDs of the resource entries.
+
+    Returns:
+        tuple: (user_id, user_role)
+
+    Raises:
+        HTTPException: If validation fails for any of the entries.
+    """
     user_id, user_role, _ = validate_api_key(api_key)
     if not user_id:
         raise HTTPException(status_code=403, detail="Invalid API key")
 
-    # Mysql table names
-    table_map = {
-        ResourceType.CALENDAR: "calendar_entries",
-        ResourceType.TASK: "tasks",
-        ResourceType.NOTE: "notes",
-    }
-    table_name = table_map.get(resource_type)
+    table_name = _ENTRY_TABLES.get(resource_type)
     if not table_name:
         raise HTTPException(status_code=500, detail="Invalid resource type specified for validation.")
 
-    cursor = database.get_cursor()
-    cursor.execute(f"USE {database.MYSQL_DATABASE}")
-    cursor.execute(f"SELECT user_id FROM {table_name} WHERE id = %s", (resource_id,))
-    result = cursor.fetchone()
+    if not resource_ids:
+        return user_id, user_role
 
-    if not result:
+    # The database counts the entries the user may access, all of them being there is the common case
+    if len(resource_ids) == 1:
+        # The single entry lookups run as prepared statements, kept per thread by the database module
+        cursor = database.get_prepared_cursor(_ENTRY_ACCESS_SQL[resource_type])
+        cursor.execute(_ENTRY_ACCESS_SQL[resource_type], (resource_ids[0], user_id, user_role))
+    else:
+        cursor = database.get_cursor()
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {table_name} WHERE id IN ({', '.join(['%s'] * len(resource_ids))}) "
+            "AND (user_id = %s OR %s = 'admin')",
+            (*resource_ids, user_id, user_role)
+        )
+    if cursor.fetchone()[0] == len(set(resource_ids)):
+        return user_id, user_role
+
+    # Some are missing or not the user's, their owners tell which error applies
+    if len(resource_ids) == 1:
+        cursor = database.get_prepared_cursor(_ENTRY_OWNER_SQL[resource_type])
+        cursor.execute(_ENTRY_OWNER_SQL[resource_type], tuple(resource_ids))
+    else:
+        cursor.execute(
+            f"SELECT id, user_id FROM {table_name} WHERE id IN ({', '.join(['%s'] * len(resource_ids))})",
+            tuple(resource_ids)
+        )
+    owners = dict(cursor.fetchall())
+
+    for resource_id in resource_ids:
+        check_entry_owner(user_id, user_role, resource_type, owners.get(resource_id))
+
+    return user_id, user_role
+
+def check_entry_owner(user_id: str, user_role: str, resource_type: ResourceType, entry_owner_id: Optional[str]):
+    """
+    Checks if a user may access an entry, for callers that read the entry's owner along with the entry itself.
+
+    Args:
+        user_id (str): The ID of the user, as returned by validate_api_key.
+        user_role (str): The role of the user.
+        resource_type (ResourceType): The type of the resource.
+        entry_owner_id (Optional[str]): The user_id of the entry, None if the entry does not exist.
+
+    Raises:
+        HTTPException: If the entry does not exist or belongs to another user.
+    """
+    if entry_owner_id is None:
         raise HTTPException(status_code=404, detail=f"{resource_type.value.capitalize()} entry not found")
 
     # Non admin can only access their own entries
-    if user_role != 'admin':
-        entry_owner_id = result[0]
-        if user_id != entry_owner_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-
-    return user_id, user_role
+    if user_role != 'admin' and user_id != entry_owner_id:
+        raise HTTPException(status_code=403, detail="Access denied")
 
 # RRULE Query Helpers
 
@@ -169,6 +310,11 @@ def _normalize_dt(val):
     raise HTTPException(status_code=400, detail="Invalid time argument type")
 
 
+@functools.lru_cache(maxsize=4096)
+def _parse_vrecur(rrule_str: str) -> icalendar.prop.vRecur:
+    """Parse an RRULE value once per rule string, the components built from it only read it"""
+    return icalendar.prop.vRecur.from_ical(rrule_str)
+
 def _event_to_ical_component(ev: Dict[str, Any]) -> Optional[icalendar.Event]:
     """
     Convert an event in the format used by Organizr to an iCalendar Event component.
@@ -195,21 +341,24 @@ def _event_to_ical_component(ev: Dict[str, Any]) -> Optional[icalendar.Event]:
     ical_ev = icalendar.Event()
     uid = f"organizr-{ev.get('user_id', '')}-{ev.get('id', '')}"
     ical_ev.add("uid", uid)
-    if ev.get("title"):
-        ical_ev.add("summary", ev.get("title"))
-    if ev.get("description"):
-        ical_ev.add("description", ev.get("description"))
+    title = ev.get("title")
+    if title:
+        ical_ev.add("summary", title)
+    description = ev.get("description")
+    if description:
+        ical_ev.add("description", description)
     ical_ev.add("dtstart", start)
     ical_ev.add("dtend", end)
-    ical_ev.add("rrule", icalendar.prop.vRecur.from_ical(str(rrule)))
-    if ev.get("id") is not None:
-        ical_ev.add("ORGANIZR-ID", str(ev.get("id")))
-    if ev.get("user_id") is not None:
-        ical_ev.add("ORGANIZR-USER-ID", str(ev.get("user_id")))
-    if ev.get("tags"):
-        ical_ev.add("ORGANIZR-TAGS", json.dumps(ev.get("tags")))
-    if ev.get("rrule"):
-        ical_ev.add("ORGANIZR-RRULE", str(ev.get("rrule")))
+    ical_ev.add("rrule", _parse_vrecur(str(rrule)))
+    ev_id = ev.get("id")
+    if ev_id is not None:
+        ical_ev.add("ORGANIZR-ID", str(ev_id))
+    user_id = ev.get("user_id")
+    if user_id is not None:
+        ical_ev.add("ORGANIZR-USER-ID", str(user_id))
+    tags = ev.get("tags")
+    if tags:
+        ical_ev.add("ORGANIZR-TAGS", orjson.dumps(tags).decode())
     return ical_ev
 
 
@@ -236,35 +385,106 @@ def _build_ical_from_events(events: List[Dict[str, Any]]) -> icalendar.Calendar:
     return cal
 
 
-def _occurrence_to_org_dict(comp) -> Dict[str, Any]:
+def _occurrence_to_org_dict(comp, rrules: Dict[Any, str]) -> Dict[str, Any]:
     """
     Converts an iCalendar Event to a dictionary in the format used by Organizr.
 
     Args:
         comp (icalendar.Event): iCalendar Event component.
+        rrules (Dict[Any, str]): RRULE of the source events by their id, occurrences do not carry it.
     Returns:
         Dict[str, Any]: Dictionary containing event details in the Organizr format.
     """
     occ_start = comp.get("DTSTART").dt
-    occ_end = comp.get("DTEND").dt if comp.get("DTEND") else occ_start
+    dtend = comp.get("DTEND")
+    occ_end = dtend.dt if dtend else occ_start
     raw_id = comp.get("ORGANIZR-ID")
     raw_user = comp.get("ORGANIZR-USER-ID")
     raw_tags = comp.get("ORGANIZR-TAGS")
-    raw_rrule = comp.get("ORGANIZR-RRULE")
+    ev_id = int(raw_id) if raw_id is not None else None
+    summary = comp.get("SUMMARY")
+    description = comp.get("DESCRIPTION")
     return {
-        "id": int(raw_id) if raw_id is not None else None,
+        "id": ev_id,
         "user_id": str(raw_user) if raw_user is not None else None,
-        "title": str(comp.get("SUMMARY")) if comp.get("SUMMARY") else "",
-        "description": str(comp.get("DESCRIPTION")) if comp.get("DESCRIPTION") else None,
+        "title": str(summary) if summary else "",
+        "description": str(description) if description else None,
         "start_datetime": occ_start,
         "end_datetime": occ_end,
-        "rrule": str(raw_rrule) if raw_rrule is not None else None,
-        "tags": json.loads(str(raw_tags)) if raw_tags else None,
+        "rrule": rrules.get(ev_id),
+        "tags": orjson.loads(str(raw_tags)) if raw_tags else None,
     }
 
+def _occurrence_to_org_dict_fast(comp, rrules: Dict[Any, str]) -> Dict[str, Any]:
+    """_occurrence_to_org_dict for occurrences of events that all have an id and user_id, which skips checking for them"""
+    dtend = comp.get("DTEND")
+    occ_start = comp["DTSTART"].dt
+    ev_id = int(comp["ORGANIZR-ID"])
+    summary = comp.get("SUMMARY")
+    description = comp.get("DESCRIPTION")
+    raw_tags = comp.get("ORGANIZR-TAGS")
+    return {
+        "id": ev_id,
+        "user_id": str(comp["ORGANIZR-USER-ID"]),
+        "title": str(summary) if summary else "",
+        "description": str(description) if description else None,
+        "start_datetime": occ_start,
+        "end_datetime": dtend.dt if dtend else occ_start,
+        "rrule": rrules.get(ev_id),
+        "tags": orjson.loads(str(raw_tags)) if raw_tags else None,
+    }
+
+def _expansion_key(ev: Dict[str, Any], start_dt: datetime.datetime, end_dt: datetime.datetime) -> Optional[tuple]:
+    """Cache key of the occurrences of an event within a window, None if the event's values can't be hashed"""
+    tags = ev.get("tags")
+    key = (
+        ev.get("id"), ev.get("user_id"), ev.get("title"), ev.get("description"), ev.get("start_datetime"),
+        ev.get("end_datetime"), ev.get("rrule"), tuple(tags) if isinstance(tags, list) else tags, start_dt, end_dt,
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _expand_event_rrule(ev: Dict[str, Any], start_dt: datetime.datetime, end_dt: datetime.datetime) -> Optional[List[Dict[str, Any]]]:
+    """
+    Occurrences of an event within a window expanded with dateutil, reusing those expanded within EXPANSION_CACHE_TTL seconds.
+    The returned list is shared with the cache and must not be changed.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: Occurrences in order of start time, None if the event needs the iCalendar path.
+    """
+    key = _expansion_key(ev, start_dt, end_dt) if EXPANSION_CACHE_TTL > 0 else None
+    now = time.monotonic()
+    if key is not None:
+        with _expansion_cache_lock:
+            cached = _expansion_cache.get(key)
+            if cached is not None and now - cached[0] < EXPANSION_CACHE_TTL:
+                _expansion_cache.move_to_end(key)
+                return cached[1]
+
+    occurrences = _iter_event_rrule(ev, start_dt, end_dt)
+    if occurrences is None:
+        return None
+    result = [occ for _, occ in occurrences]
+
+    if key is not None:
+        with _expansion_cache_lock:
+            _expansion_cache[key] = (now, result)
+            _expansion_cache.move_to_end(key)
+            if len(_expansion_cache) > EXPANSION_CACHE_SIZE:
+                _expansion_cache.popitem(last=False)
+    return result
+
+def _occurrence_order(occ: Dict[str, Any]):
+    """Sort key of expanded occurrences, by start and then event id"""
+    return (occ.get("start_datetime") or datetime.datetime.min, occ.get("id") or 0)
+
 def handle_rrule_query(events_with_rrule, start_date, end_date):
     """
-    Turn recurring events into iCal Formats and create an iCalendar Calendar, which is then used to query it with the given rrule.
+    Expand recurring events within a time frame. Plain rules are expanded with dateutil directly, others are turned into iCal Formats
+    and an iCalendar Calendar is created, which is then used to query it with the given rrule.
 
     Args:
         events_with_rrule (List[Dict[str, Any]]): Events in Organizr format containing an 'rrule'.
@@ -282,84 +502,343 @@ def handle_rrule_query(events_with_rrule, start_date, end_date):
     if start_dt >= end_dt:
         raise HTTPException(status_code=400, detail="'start_date' must be before 'end_date'")
 
-    # Build iCal calendar from events
+    # Plain rules are expanded with dateutil directly, the others through an iCalendar calendar.
+    # Each event's occurrences come in time order, so the per event lists only need merging.
+    per_event = []
+    ical_events = []
+    for ev in events_with_rrule:
+        try:
+            occurrences = _expand_event_rrule(ev, start_dt, end_dt) if ev.get("rrule") else None
+        except Exception as ex:
+            logger.warning(f"Skipping event {ev.get('id')} due to RRULE or data error: {ex}")
+            continue
+        if occurrences is None:
+            ical_events.append(ev)
+        else:
+            per_event.append(occurrences)
+
+    if not ical_events:
+        return list(heapq.merge(*per_event, key=_occurrence_order))
+
+    # Build iCal calendar from events, the occurrences get their rrule from here instead of a custom property
+    rrules = {ev.get("id"): ev.get("rrule") for ev in ical_events}
+    # Events of our own tables always have both ids, then the occurrences are read without checking for them
+    to_org_dict = _occurrence_to_org_dict
+    if all(ev.get("id") is not None and ev.get("user_id") is not None for ev in ical_events):
+        to_org_dict = _occurrence_to_org_dict_fast
     try:
-        cal = _build_ical_from_events(events_with_rrule)
-        cal_bytes = cal.to_ical()
-        a_calendar = icalendar.Calendar.from_ical(cal_bytes)
-        occurrences = recurring_ical_events.of(a_calendar, skip_bad_series=True).between(start_dt, end_dt)
+        # The built calendar is expanded as is, serializing and re-parsing it gives the same components
+        cal = _build_ical_from_events(ical_events)
+        occurrences = recurring_ical_events.of(cal, skip_bad_series=True).between(start_dt, end_dt)
     except HTTPException:
         raise
     except Exception as ex:
         logger.error(f"Error expanding rrules: {ex}")
         raise HTTPException(status_code=500, detail="Failed to expand recurring events")
 
-    # Convert occurrences back to our format
-    results = []
+    # Convert occurrences back to our format, they come in no particular order
+    ical_results = []
     for comp in occurrences:
         try:
-            results.append(_occurrence_to_org_dict(comp))
+            ical_results.append(to_org_dict(comp, rrules))
         except Exception as ex:
             logger.warning(f"Failed to read occurrence: {ex}")
             continue
 
-    results.sort(key=lambda x: (x.get("start_datetime") or datetime.datetime.min, x.get("id") or 0))
-    return results
+    ical_results.sort(key=_occurrence_order)
+    per_event.append(ical_results)
+    return list(heapq.merge(*per_event, key=_occurrence_order))
+
+def rrule_until(rrule) -> Optional[datetime.datetime]:
+    """
+    Read the UNTIL of an rrule without parsing the whole rule.
+
+    Args:
+        rrule (str): RRULE as stored with the task or event.
+
+    Returns:
+        datetime.datetime: UNTIL as naive datetime (a UTC suffix is ignored), None if the rule has none or it is invalid.
+    """
+    match = _RRULE_UNTIL_RE.search(str(rrule or ""))
+    if not match:
+        return None
+    try:
+        return datetime.datetime.strptime(match.group(1) + (match.group(2) or "235959"), "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=128)
+def _parse_rrule(rrule_str: str, dtstart: datetime.datetime):
+    """Parse an rrule once per (rule, start); cache=True also keeps the occurrences dateutil computed for later iterations"""
+    return rrulestr(rrule_str, dtstart=dtstart, cache=True)
+
+def expand_rrule(rrule, dtstart: datetime.datetime, horizon: datetime.datetime, max_count: int) -> Tuple[List[datetime.datetime], Optional[datetime.datetime]]:
+    """
+    Expand an rrule from its start up to a horizon, for storing the occurrences ahead of queries.
+
+    Args:
+        rrule (str): RRULE as stored with the task or event.
+        dtstart (datetime.datetime): First occurrence.
+        horizon (datetime.datetime): Occurrences from here on are not expanded.
+        max_count (int): Maximum number of occurrences to expand.
+
+    Returns:
+        Tuple[List[datetime.datetime], Optional[datetime.datetime]]: The occurrences and the first one not expanded,
+        None if the rule has no more occurrences.
+
+    Raises:
+        ValueError, TypeError: If the rrule can't be parsed or doesn't fit dtstart.
+    """
+    occurrences = []
+    for occurrence in _iter_rule_from_start(_parse_rrule(str(rrule), dtstart), dtstart):
+        if occurrence >= horizon or len(occurrences) >= max_count:
+            return occurrences, occurrence
+        occurrences.append(occurrence)
+    return occurrences, None
+
+def _iter_rule_from_start(rule, dtstart: datetime.datetime, after: Optional[datetime.datetime] = None, inc: bool = True) -> Iterator[datetime.datetime]:
+    """
+    Occurrences of a parsed rrule in order, starting with dtstart even if the rule itself doesn't produce it (as in iCalendar).
+    With after, only the occurrences after it (or at it, with inc) are produced.
+    """
+    first = next(iter(rule), None)
+    # A rule ending before its start has no occurrences at all
+    until = getattr(rule, "_until", None)
+    if until is not None and until.replace(tzinfo=None) < dtstart:
+        return
+    if first != dtstart and (after is None or dtstart > after or (inc and dtstart == after)):
+        yield dtstart
+    yield from (rule if after is None else rule.xafter(after, inc=inc))
+
+def _rrule_occurrence(ev: Dict[str, Any], occ_start: datetime.datetime, duration: datetime.timedelta) -> Dict[str, Any]:
+    """An occurrence of an event in our format, the same as _occurrence_to_org_dict makes of an iCalendar occurrence"""
+    return {
+        "id": int(ev["id"]) if ev.get("id") is not None else None,
+        "user_id": str(ev["user_id"]) if ev.get("user_id") is not None else None,
+        "title": str(ev["title"]) if ev.get("title") else "",
+        "description": str(ev["description"]) if ev.get("description") else None,
+        "start_datetime": occ_start,
+        "end_datetime": occ_start + duration,
+        "rrule": str(ev["rrule"]),
+        "tags": ev.get("tags") or None,
+    }
+
+def _iter_event_rrule(ev: Dict[str, Any], start_dt: datetime.datetime, end_dt: datetime.datetime) -> Optional[Iterator[Tuple[datetime.datetime, Dict[str, Any]]]]:
+    """
+    Expand the rrule of an event with dateutil directly, lazily and in order of start time. Like recurring_ical_events, occurrences
+    are those overlapping the window, one without duration if it starts within it.
+
+    Args:
+        ev (Dict[str, Any]): Event in Organizr format containing an 'rrule'.
+        start_dt (datetime.datetime): Start of window.
+        end_dt (datetime.datetime): End of window, exclusive.
+    Returns:
+        Optional[Iterator[Tuple[datetime.datetime, Dict[str, Any]]]]: Start and occurrence in our format, None if the event
+        needs the iCalendar path (times with a timezone, an end before the start or a rule that is more than a plain RRULE value).
+    """
+    start = ev.get("start_datetime")
+    end = ev.get("end_datetime")
+    if isinstance(start, str):
+        start = validate_time_format(start)
+    if isinstance(end, str):
+        end = validate_time_format(end)
+    if end is None:
+        end = start
+    if not isinstance(start, datetime.datetime) or not isinstance(end, datetime.datetime) or end < start:
+        return None
+    if any(dt.tzinfo is not None for dt in (start, end, start_dt, end_dt)):
+        return None
+    rrule_str = str(ev["rrule"])
+    if ":" in rrule_str or "\n" in rrule_str:
+        # Property syntax or several properties, left to the iCalendar parser
+        return None
+    try:
+        rule = _parse_rrule(rrule_str, start)
+    except (ValueError, TypeError):
+        return None
+
+    duration = end - start
+
+    def occurrences():
+        # Occurrences with a duration overlap the window if they end after its start
+        after = start_dt - duration if duration else start_dt
+        for occ_start in _iter_rule_from_start(rule, start, after, inc=not duration):
+            if occ_start >= end_dt:
+                return
+            yield occ_start, _rrule_occurrence(ev, occ_start, duration)
+
+    return occurrences()
+
+def _iter_event_occurrences(calendar: icalendar.Calendar, rrules: Dict[Any, str], start_dt, end_dt) -> Iterator[Tuple[datetime.datetime, Dict[str, Any]]]:
+    """
+    Lazily expand the single recurring event of a calendar, in order of start time.
+
+    Args:
+        calendar (icalendar.Calendar): Calendar containing one recurring event.
+        rrules (Dict[Any, str]): RRULE of the source events by their id.
+        start_dt (datetime.datetime): Start of window.
+        end_dt (datetime.datetime): End of window, exclusive.
+    Yields:
+        Tuple[datetime.datetime, Dict[str, Any]]: Start of the occurrence and the occurrence in our format.
+    """
+    try:
+        for comp in recurring_ical_events.of(calendar, skip_bad_series=True).after(start_dt):
+            try:
+                occ = _occurrence_to_org_dict(comp, rrules)
+            except Exception as ex:
+                logger.warning(f"Failed to read occurrence: {ex}")
+                continue
+            occ_start = _normalize_dt(occ.get("start_datetime"))
+            if occ_start >= end_dt:
+                return
+            yield occ_start, occ
+    except Exception as ex:
+        logger.error(f"Error expanding rrule: {ex}")
+
+def iter_rrule_occurrences(events_with_rrule, start_date, end_date) -> Iterator[Tuple[datetime.datetime, Dict[str, Any]]]:
+    """
+    Lazy variant of handle_rrule_query, for callers that only need the first few occurrences.
+    Every event gets its own occurrence generator, which are merged by start time, so nothing past the consumed occurrences is expanded.
+
+    Args:
+        events_with_rrule (List[Dict[str, Any]]): Events in Organizr format containing an 'rrule'.
+        start_date (str|datetime): Start of window (ISO 8601 string or datetime).
+        end_date (str|datetime): End of window (ISO 8601 string or datetime).
+
+    Returns:
+        Iterator[Tuple[datetime.datetime, Dict[str, Any]]]: Start and occurrence in our format, ordered like handle_rrule_query.
+    """
+    if not events_with_rrule:
+        return iter(())
+
+    start_dt = _normalize_dt(start_date)
+    end_dt = _normalize_dt(end_date)
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="'start_date' must be before 'end_date'")
+
+    # Plain rules are expanded with dateutil directly, the others through an iCalendar calendar
+    streams = []
+    ical_events = []
+    for ev in events_with_rrule:
+        occurrences = _iter_event_rrule(ev, start_dt, end_dt) if ev.get("rrule") else None
+        if occurrences is None:
+            ical_events.append(ev)
+        else:
+            streams.append(occurrences)
+
+    # The occurrences get their rrule from here instead of a custom property on every component
+    rrules = {ev.get("id"): ev.get("rrule") for ev in ical_events}
+    try:
+        a_calendar = _build_ical_from_events(ical_events)
+    except Exception as ex:
+        logger.error(f"Error expanding rrules: {ex}")
+        raise HTTPException(status_code=500, detail="Failed to expand recurring events")
+
+    for comp in a_calendar.walk("VEVENT"):
+        single = icalendar.Calendar()
+        single.add_component(comp)
+        streams.append(_iter_event_occurrences(single, rrules, start_dt, end_dt))
+
+    return heapq.merge(*streams, key=lambda x: (x[0], x[1].get("id") or 0))
 
 def build_query_filters(search_text=None, tags=None, status=None, match_mode="and"):
-    """Build SQL conditions and params for common query filters"""
+    """
+    Build SQL conditions and params for common query filters, in 'or' mode they are combined into a single condition.
+    The text matches rows whose title or description contains it, or all of its indexed words as word prefixes.
+    """
     conds, params = [], []
+    mode = match_mode.lower()
     
     if search_text:
-        conds.append("(title LIKE %s OR description LIKE %s)")
+        fulltext_query = to_fulltext_query(search_text)
         like = f"%{search_text}%"
-        params.extend([like, like])
+        if fulltext_query:
+            conds.append("(MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) OR title LIKE %s OR description LIKE %s)")
+            params.extend([fulltext_query, like, like])
+        else:
+            conds.append("(title LIKE %s OR description LIKE %s)")
+            params.extend([like, like])
     
     if status is not None:
         conds.append("status = %s")
-        params.append(status.value if hasattr(status, 'value') else status)
+        params.append(status.value)
     
     if tags:
-        tag_conds = []
-        for t in tags:
-            tag_conds.append("JSON_CONTAINS(tags, CAST(%s AS JSON))")
-            params.append(json.dumps(t))
-        joiner = " AND " if match_mode.lower() == "and" else " OR "
-        conds.append(f"({joiner.join(tag_conds)})")
+        if mode == "and":
+            tag_conds = []
+            for t in tags:
+                tag_conds.append("JSON_CONTAINS(tags, CAST(%s AS JSON))")
+                params.append(json.dumps(t))
+            conds.append(f"({' AND '.join(tag_conds)})")
+        else:
+            # Any of the tags, checked in one go
+            conds.append("JSON_OVERLAPS(tags, CAST(%s AS JSON))")
+            params.append(json.dumps(list(tags)))
+    
+    if mode != "and" and len(conds) > 1:
+        conds = [f"({' OR '.join(conds)})"]
     
     return conds, params
 
+def to_fulltext_query(search_text):
+    """
+    Convert free search text into a boolean mode fulltext query requiring every word as a prefix
+
+    The query matches words, not substrings: "port" finds "Port" and "portal" but not "report". Callers combine it with
+    a LIKE substring condition to also find those. Words that are not indexed (too short or stopwords) are left out.
+
+    Args:
+        search_text: Text as entered by the user
+
+    Returns:
+        str: Query for MATCH ... AGAINST (... IN BOOLEAN MODE), None if no word of the text is indexed
+    """
+    words = [
+        word for word in re.findall(r"\w+", search_text)
+        if len(word) >= FULLTEXT_MIN_WORD_LENGTH and word.lower() not in FULLTEXT_STOPWORDS
+    ]
+    if not words:
+        return None
+    return " ".join(f"+{word}*" for word in words)
+
 def apply_match_mode_filter(items, search_text=None, tags=None, status=None, match_mode="and"):
     """Apply match_mode filtering to a list of items if we cant use SQL for it"""
     if not any([search_text, tags, status]):
         return items
     
     mode = match_mode.lower()
+    # Worked out once instead of per item
+    search_lower = search_text.lower() if search_text else None
+    status_val = status.value if status is not None else None
+    tag_set = frozenset(tags) if tags else None
     
     def matches_item(item):
         matches = []
         
-        if search_text:
+        if search_lower:
             title = (item.get("title") or "").lower()
             desc = (item.get("description") or "").lower()
-            matches.append(search_text.lower() in title or search_text.lower() in desc)
+            matches.append(search_lower in title or search_lower in desc)
         
-        if status is not None:
-            item_status = item.get("status")
-            status_val = status.value if hasattr(status, 'value') else status
-            matches.append(item_status == status_val)
+        if status_val is not None:
+            matches.append(item.get("status") == status_val)
         
-        if tags:
+        if tag_set:
             item_tags = item.get("tags") or []
             if isinstance(item_tags, str):
                 try:
-                    item_tags = json.loads(item_tags)
-                except (json.JSONDecodeError, TypeError):
+                    item_tags = orjson.loads(item_tags)
+                except orjson.JSONDecodeError:
                     item_tags = []
+            try:
+                item_tag_set = frozenset(item_tags)
+            except TypeError:
+                # Malformed tags holding lists or objects, only the plain values can match
+                item_tag_set = frozenset(t for t in item_tags if isinstance(t, str))
             if mode == "and":
-                matches.append(all(t in item_tags for t in tags))
+                matches.append(tag_set.issubset(item_tag_set))
             else:
-                matches.append(any(t in item_tags for t in tags))
+                matches.append(not tag_set.isdisjoint(item_tag_set))
         
         return all(matches) if mode == "and" else any(matches)
     
@@ -375,32 +854,53 @@ def list_to_json(lst):
     Returns:
         str: JSON string representation of the list
     """
-    return json.dumps(lst) if lst else None
+    return orjson.dumps(lst).decode() if lst else None
 
-def json_to_list(json_str: Optional[str]) -> Optional[List[Any]]:
+def json_to_list(json_str: Any) -> Optional[List[Any]]:
     """
     Convert a JSON string to a list.
 
     Args:
-        json_str: JSON string to convert.
+        json_str: JSON string to convert, or a list that is already decoded.
 
     Returns:
         List or None: Parsed list if valid, None otherwise.
     """
     if not json_str:
         return None
+    if isinstance(json_str, list):
+        return json_str
     try:
-        data = json.loads(json_str)
+        data = orjson.loads(json_str)
         if isinstance(data, list):
             return data
         return None
-    except (json.JSONDecodeError, TypeError):
+    except (orjson.JSONDecodeError, TypeError):
         logger.warning(f"Could not decode JSON string to list: {json_str}")
         return None
 
+def parse_tags(raw_tags: Any) -> Optional[List[Any]]:
+    """
+    Convert a tags column value as returned by the driver into a list.
+
+    Args:
+        raw_tags: JSON text (str, bytes) as returned by the driver, or a list that is already decoded.
+
+    Returns:
+        List or None: Parsed tags, None if the column is NULL, an empty list if it does not hold a JSON list.
+    """
+    if raw_tags is None or isinstance(raw_tags, list):
+        return raw_tags
+    try:
+        tags = orjson.loads(raw_tags)
+    except (orjson.JSONDecodeError, TypeError):
+        return []
+    return tags if isinstance(tags, list) else []
+
+@functools.lru_cache(maxsize=4096)
 def validate_time_format(time_str):
     """
-    Validate time format (ISO 8601) and return as datetime object
+    Validate time format (ISO 8601) and return as datetime object, cached as the same strings come in again and again
 
     Args:
         time_str: Time string to validate
@@ -408,6 +908,14 @@ def validate_time_format(time_str):
     Returns:
         datetime: Parsed datetime object if valid, None otherwise
     """
+    try:
+        # The C parser of the standard library covers the usual forms, dateutil the rest of ISO 8601.
+        # Before Python 3.11 it does not know the Z suffix, which is spelled out for it.
+        if time_str.endswith("Z"):
+            return datetime.datetime.fromisoformat(time_str[:-1] + "+00:00")
+        return datetime.datetime.fromisoformat(time_str)
+    except (ValueError, TypeError, AttributeError):
+        pass
     try:
         return parser.isoparse(time_str)
     except ValueError:
@@ -2,9 +2,17 @@
 
 import os
 import logging
-import json
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import orjson
 import requests
-from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pydantic import TypeAdapter, create_model
+from typing import Any, List, Literal, Optional
 
 # --- Environment Variables ---
 organizr_key = os.environ.get('ORGANIZR_API_KEY')
@@ -12,6 +20,71 @@ organizr_baseurl = os.environ.get('ORGANIZR_BASE_URL')
 
 logger = logging.getLogger(__name__)
 
+# External IDs linked in the organizrbot app, fetched again when older than KNOWN_USERS_TTL seconds or on a miss.
+# Only known IDs are answered from it, so a user registered in the meantime is still found.
+KNOWN_USERS_TTL = 3600
+_known_users = set()
+_known_users_expiry = 0.0
+
+# Internal user IDs by external ID as external ID -> (expires at, internal ID), the least recently used go first beyond
+# ID_CACHE_SIZE
+ID_CACHE_TTL = 3600
+ID_CACHE_SIZE = 10000
+_id_cache = OrderedDict()
+_id_cache_lock = threading.Lock()
+
+# Result of the last health check, reused for HEALTH_TTL seconds
+HEALTH_TTL = 5.0
+HEALTH_TIMEOUT = 2.0
+_health_checked = float('-inf')
+_health_ok = False
+
+# --- HTTP Session ---
+# One session for all calls, so connections to the organizr API are kept alive and reused instead of opened per request.
+# Rate limits and gateway errors are retried with backoff here instead of costing the LLM a tool call round trip.
+# Only idempotent methods are retried, a retried POST could create an entry twice.
+_session = requests.Session()
+_session.headers.update({'accept': 'application/json', 'X-API-Key': organizr_key})
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),
+        raise_on_status=False,
+    ),
+)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+# Connections opened by warmup() before polling starts
+WARMUP_CONNECTIONS = 3
+
+# GET requests in flight by their key, later identical ones wait for the first instead of being sent again. The response
+# is handed to them as JSON bytes, so every caller parses its own copy and can change it without affecting the others.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Responses of the read-only tools as (endpoint, params) -> (fetched at, response as JSON bytes), as the LLM tends to read
+# the same lists again within one turn. Every hit parses its own copy. Dropped per resource when the bot changes it,
+# the oldest go first beyond _READ_CACHE_SIZE.
+_READ_TTL = 3.0
+_READ_CACHE_SIZE = 512
+_read_cache = {}
+_read_cache_lock = threading.Lock()
+
+# Base URL without a trailing slash, the endpoints all start with one
+_BASE = (organizr_baseurl or '').rstrip('/')
+_HEALTH_URL = _BASE + '/health'
+
+# The endpoints called with a fixed path, prepared once with the session's headers. Their requests are copies of these,
+# so URL parsing and header merging of the base part aren't repeated on every call.
+_PREPARED = {
+    endpoint: _session.prepare_request(requests.Request('GET', _BASE + endpoint))
+    for endpoint in ('/notes/', '/tasks/', '/calendar/', '/apps/', '/apps/organizrbot/users', '/apps/organizrbot/translate')
+} if _BASE else {}
+
 # --- Tool Definitions for LLM ---
 functions = [
     {
@@ -79,6 +152,20 @@ functions = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_notes",
+            "description": "Deletes several notes identified by their IDs at once. Use this instead of delete_note when more than one note should be deleted. Nothing is deleted if one of them can't be.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "note_ids": {"type": "array", "items": {"type": "integer"}, "description": "The IDs of the notes to delete."},
+                },
+                "required": ["note_ids"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -151,6 +238,20 @@ functions = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_tasks",
+            "description": "Deletes several tasks identified by their IDs at once. Use this instead of delete_task when more than one task should be deleted. Nothing is deleted if one of them can't be.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_ids": {"type": "array", "items": {"type": "integer"}, "description": "The IDs of the tasks to delete."},
+                },
+                "required": ["task_ids"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -236,45 +337,155 @@ functions = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_events",
+            "description": "Deletes several events identified by their IDs at once. Use this instead of delete_event when more than one event should be deleted. Nothing is deleted if one of them can't be.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "event_ids": {"type": "array", "items": {"type": "integer"}, "description": "The IDs of the events to delete."},
+                },
+                "required": ["event_ids"],
+            },
+        },
+    },
 ]
 
 # --- Helper Function for API Calls ---
 def _request(method, endpoint, **kwargs):
-    """A generic wrapper for making requests to the organizr API."""
+    """A generic wrapper for making requests to the organizr API, identical GETs running at the same time share one response."""
+    if method.lower() != "get" or kwargs.keys() - {"params"}:
+        return _send_request(method, endpoint, **kwargs)
+
+    key = _inflight_key(endpoint, kwargs.get("params"))
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+    if not leader:
+        return orjson.loads(future.result())
+
+    try:
+        result = _send_request(method, endpoint, **kwargs)
+        future.set_result(orjson.dumps(result))
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+def _inflight_key(endpoint, params):
+    """Hashable key of a GET request, list parameters like tags become tuples"""
+    return endpoint, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (params or {}).items()))
+
+def _prepared(method, endpoint, params=None, json=None):
+    """Request to one of the fixed endpoints, copied from its template with only method, query and body filled in"""
+    request = _PREPARED[endpoint].copy()
+    request.method = method.upper()
+    request.prepare_url(request.url, params)
+    request.prepare_body(None, None, json)
+    return request
+
+def _send_request(method, endpoint, **kwargs):
+    """Make one request to the organizr API, errors are returned as status dicts."""
     try:
-        headers = kwargs.pop('headers', {})
-        headers['accept'] = 'application/json'
-        headers['X-API-Key'] = organizr_key
-        
-        url = f"{organizr_baseurl}{endpoint}"
-        
-        response = requests.request(method, url, headers=headers, **kwargs)
+        if endpoint in _PREPARED and kwargs.keys() <= {"params", "json"}:
+            response = _session.send(_prepared(method, endpoint, **kwargs))
+        else:
+            response = _session.request(method, _BASE + endpoint, **kwargs)
         response.raise_for_status()
-        
-        if response.status_code == 204 or not response.content:
+
+        # The body is read once and parsed straight from the bytes, empty bodies are not parsed at all
+        if response.status_code == 204:
+            return {"status": "success", "message": "Operation completed successfully."}
+        body = response.content
+        if not body:
             return {"status": "success", "message": "Operation completed successfully."}
-            
-        return response.json()
+        return orjson.loads(body)
     except requests.exceptions.HTTPError as e:
         try:
-            error_detail = e.response.json().get("detail", str(e))
-        except json.JSONDecodeError:
+            error_detail = orjson.loads(e.response.content).get("detail", str(e))
+        except orjson.JSONDecodeError:
             error_detail = e.response.text
-        logger.error(f"HTTP error calling {method} {endpoint}: {e.response.status_code} - {error_detail}")
+        logger.error("HTTP error calling %s %s: %s - %s", method, endpoint, e.response.status_code, error_detail)
         return {"status": "error", "message": f"API Error: {error_detail}"}
     except requests.exceptions.RequestException as e:
-        logger.error(f"Request exception calling {method} {endpoint}: {e}")
+        logger.error("Request exception calling %s %s: %s", method, endpoint, e)
         return {"status": "error", "message": f"Connection Error: {e}"}
+    except orjson.JSONDecodeError as e:
+        logger.error("Invalid JSON response calling %s %s: %s", method, endpoint, e)
+        return {"status": "error", "message": f"Invalid API response: {e}"}
+
+def _cached_get(endpoint, params=None):
+    """GET for the read-only tools, answered from the cache if the same read was made within _READ_TTL seconds"""
+    key = _inflight_key(endpoint, params)
+    now = time.monotonic()
+    with _read_cache_lock:
+        cached = _read_cache.get(key)
+        cached = cached[1] if cached is not None and now - cached[0] < _READ_TTL else None
+    if cached is not None:
+        return orjson.loads(cached)
+
+    result = _request("get", endpoint, params=params)
+    if isinstance(result, dict) and result.get("status") == "error":
+        return result
+    with _read_cache_lock:
+        _read_cache.pop(key, None)
+        _read_cache[key] = (now, orjson.dumps(result))
+        if len(_read_cache) > _READ_CACHE_SIZE:
+            del _read_cache[next(iter(_read_cache))]
+    return result
+
+def _write_request(method, endpoint, **kwargs):
+    """Request changing notes, tasks or events, which drops the cached reads of that resource"""
+    result = _request(method, endpoint, **kwargs)
+    prefix = "/" + endpoint.split("/")[1] + "/"
+    with _read_cache_lock:
+        for key in [key for key in _read_cache if key[0].startswith(prefix)]:
+            del _read_cache[key]
+    return result
+
+def _compact(keys, values):
+    """The parameters under the wrapper's precomputed keys without those left out (None), so falsy values like an
+    empty string are still sent. Built in one pass, without an intermediate kwargs dict."""
+    return {key: value for key, value in zip(keys, values) if value is not None}
 
 # --- Bot Background Functions (not exposed to LLM) ---
 
 def check_health():
+    """Whether the organizr API is up, the answer is reused for HEALTH_TTL seconds"""
+    global _health_checked, _health_ok
+    now = time.monotonic()
+    if now - _health_checked < HEALTH_TTL:
+        return _health_ok
     try:
-        response = requests.get(f"{organizr_baseurl}/health", headers={'accept': 'application/json'})
-        return response.json().get("status") == "ok"
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Health check failed: {e}")
-        return False
+        response = _session.get(_HEALTH_URL, timeout=HEALTH_TIMEOUT)
+        healthy = orjson.loads(response.content).get("status") == "ok"
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        logger.error("Health check failed: %s", e)
+        healthy = False
+    _health_checked, _health_ok = now, healthy
+    return healthy
+
+def warmup(connections=WARMUP_CONNECTIONS):
+    """Open a few keep-alive connections to the organizr API at startup, so the first user messages don't pay for the
+    TCP and TLS handshakes. The health checks run at the same time, one after another would all use the same connection."""
+    def ping():
+        try:
+            _session.get(_HEALTH_URL).close()
+        except requests.exceptions.RequestException as e:
+            logger.warning("Warm-up request failed: %s", e)
+    threads = [threading.Thread(target=ping, daemon=True) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
 def list_apps():
     return _request("get", "/apps/")
@@ -283,113 +494,221 @@ def create_app(name="organizrbot"):
     return _request("post", "/apps/", json={"name": name})
 
 def check_user_exists_in_app(externalId):
+    """Whether the external ID is linked in the organizrbot app, known IDs are answered from a snapshot of the app's users"""
+    global _known_users, _known_users_expiry
+    external_id = str(externalId)
+    if external_id in _known_users and time.monotonic() < _known_users_expiry:
+        return True
+
+    # Unknown or outdated, a user linked since the snapshot must not be linked again
     users = _request("get", "/apps/organizrbot/users")
-    if isinstance(users, list):
-        return any(user.get('external_id') == str(externalId) for user in users)
-    return False
+    if not isinstance(users, list):
+        return False
+    _known_users = {str(user.get('external_id')) for user in users}
+    _known_users_expiry = time.monotonic() + KNOWN_USERS_TTL
+    return external_id in _known_users
 
 def create_and_link_user(externalId):
     user_data = _request("post", "/users/")
     if user_data and "user_id" in user_data:
         user_id = user_data["user_id"]
         link_data = {"user_id": user_id, "external_id": str(externalId)}
-        return _request("post", "/apps/organizrbot/users", json=link_data)
+        result = _request("post", "/apps/organizrbot/users", json=link_data)
+        if result.get("status") != "error":
+            _known_users.add(str(externalId))
+        return result
     else:
-        logger.error(f"Failed to create internal user for externalId {externalId}. Response: {user_data}")
+        logger.error("Failed to create internal user for externalId %s. Response: %s", externalId, user_data)
         return {"status": "error", "message": "Failed to create internal API user."}
 
 def id_to_internal(externalId):
-    response = _request("get", f"/apps/organizrbot/translate", params={"external_id": str(externalId)})
-    return response.get("user_id") if response and "user_id" in response else None
+    """Internal user ID of an external one, remembered for ID_CACHE_TTL seconds as the link rarely changes"""
+    external_id = str(externalId)
+    now = time.monotonic()
+    with _id_cache_lock:
+        cached = _id_cache.get(external_id)
+        if cached is not None and now < cached[0]:
+            _id_cache.move_to_end(external_id)
+            return cached[1]
+
+    # Failed lookups are not cached and tried again on the next call
+    response = _request("get", f"/apps/organizrbot/translate", params={"external_id": external_id})
+    if not response or "user_id" not in response:
+        return None
+    with _id_cache_lock:
+        _id_cache[external_id] = (now + ID_CACHE_TTL, response["user_id"])
+        _id_cache.move_to_end(external_id)
+        while len(_id_cache) > ID_CACHE_SIZE:
+            _id_cache.popitem(last=False)
+    return response["user_id"]
+
+def clear_id_cache():
+    """Forget the remembered ID translations, the next id_to_internal of each user asks the api again"""
+    with _id_cache_lock:
+        _id_cache.clear()
+
+def append_to_note(note_id, content):
+    """Append text to a note without sending its whole content, used for the chat history log"""
+    return _write_request("post", f"/notes/{note_id}/append", json={"content": content})
+
+# --- Wrapper Factories ---
+# The query, get and delete tools only differ in endpoint and parameters, so their wrappers are generated.
+# Each gets a real signature, arguments are checked like for a plain function and for_user is found in it.
+_REQUIRED = inspect.Parameter.empty
+
+def _make_query(name, endpoint, params):
+    """Tool wrapper reading an endpoint with the given query parameters, as (name, default) pairs"""
+    signature = inspect.Signature([
+        inspect.Parameter(param, inspect.Parameter.POSITIONAL_OR_KEYWORD, default=default) for param, default in params
+    ])
+
+    def query(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return _cached_get(endpoint, params={key: value for key, value in bound.arguments.items() if value is not None})
+
+    query.__name__ = query.__qualname__ = name
+    query.__signature__ = signature
+    return query
+
+def _make_by_id(name, method, endpoint, id_param):
+    """Tool wrapper for a single entry, read or deleted by its ID"""
+    signature = inspect.Signature([
+        inspect.Parameter(id_param, inspect.Parameter.POSITIONAL_OR_KEYWORD),
+        inspect.Parameter("for_user", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=None),
+    ])
+
+    def by_id(*args, **kwargs):
+        entry_endpoint = f"{endpoint}{signature.bind(*args, **kwargs).arguments[id_param]}"
+        if method == "get":
+            return _cached_get(entry_endpoint)
+        return _write_request(method, entry_endpoint)
+
+    by_id.__name__ = by_id.__qualname__ = name
+    by_id.__signature__ = signature
+    return by_id
+
+def _make_bulk_delete(name, endpoint, ids_param):
+    """Tool wrapper deleting several entries with one request to the endpoint's bulk-delete"""
+    signature = inspect.Signature([
+        inspect.Parameter(ids_param, inspect.Parameter.POSITIONAL_OR_KEYWORD),
+        inspect.Parameter("for_user", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=None),
+    ])
+
+    def bulk_delete(*args, **kwargs):
+        ids = signature.bind(*args, **kwargs).arguments[ids_param]
+        return _write_request("post", f"{endpoint}bulk-delete", json={"ids": list(ids)})
+
+    bulk_delete.__name__ = bulk_delete.__qualname__ = name
+    bulk_delete.__signature__ = signature
+    return bulk_delete
 
 # --- API Wrapper Functions for LLM Tools ---
 
 # NOTES
-def create_note(for_user: str, title: str, content: str, tags: Optional[List[str]] = None):
-    payload = {"title": title, "content": content, "tags": tags or []}
-    return _request("post", "/notes/", params={"for_user": for_user}, json=payload)
-
-def get_notes(for_user: str, note_id: Optional[int] = None, title: Optional[str] = None, content: Optional[str] = None, tags: Optional[List[str]] = None, match_mode: str = "and"):
-    params = {"for_user": for_user, "match_mode": match_mode}
-    if note_id: params['note_id'] = note_id
-    if title: params['title'] = title
-    if content: params['content'] = content
-    if tags: params['tags'] = tags
-    return _request("get", "/notes/", params=params)
-
-def update_note(note_id: int, new_title: Optional[str] = None, new_content: Optional[str] = None, new_tags: Optional[List[str]] = None, for_user: Optional[str] = None):
-    payload = {}
-    if new_title is not None: payload['title'] = new_title
-    if new_content is not None: payload['content'] = new_content
-    if new_tags is not None: payload['tags'] = new_tags
+def create_note(for_user: str, title: str, content: str, tags: Optional[List[str]] = None, is_log: bool = False):
+    payload = {"title": title, "content": content, "tags": tags or [], "is_log": is_log}
+    return _write_request("post", "/notes/", params={"for_user": for_user}, json=payload)
+
+get_notes = _make_query("get_notes", "/notes/", [
+    ("for_user", _REQUIRED), ("note_id", None), ("title", None), ("content", None), ("tags", None), ("match_mode", "and"),
+])
+
+_UPDATE_NOTE_KEYS = ("title", "content", "tags", "is_log")
+
+def update_note(note_id: int, new_title: Optional[str] = None, new_content: Optional[str] = None, new_tags: Optional[List[str]] = None, for_user: Optional[str] = None, is_log: Optional[bool] = None):
+    payload = _compact(_UPDATE_NOTE_KEYS, (new_title, new_content, new_tags, is_log))
     if not payload: return {"status": "info", "message": "No fields provided to update."}
-    return _request("put", f"/notes/{note_id}", json=payload)
+    return _write_request("put", f"/notes/{note_id}", json=payload)
 
-def delete_note(note_id: int, for_user: Optional[str] = None):
-    return _request("delete", f"/notes/{note_id}")
+delete_note = _make_by_id("delete_note", "delete", "/notes/", "note_id")
+delete_notes = _make_bulk_delete("delete_notes", "/notes/", "note_ids")
 
 # TASKS
+_CREATE_TASK_KEYS = ("for_user", "title", "status", "description", "due_date", "rrule", "tags")
+_UPDATE_TASK_KEYS = ("title", "description", "status", "due_date", "rrule", "tags")
+
 def create_task(for_user: str, title: str, description: Optional[str] = None, status: str = "pending", due_date: Optional[str] = None, rrule: Optional[str] = None, tags: Optional[List[str]] = None):
-    params = {"for_user": for_user, "title": title, "status": status}
-    if description: params['description'] = description
-    if due_date: params['due_date'] = due_date
-    if rrule: params['rrule'] = rrule
-    if tags: params['tags'] = tags
-    return _request("post", "/tasks/", params=params)
-
-def get_tasks(for_user: str, search_text: Optional[str] = None, tags: Optional[List[str]] = None, status: Optional[str] = None, due_after: Optional[str] = None, due_before: Optional[str] = None, match_mode: str = "and"):
-    params = {"for_user": for_user, "match_mode": match_mode}
-    if search_text: params['search_text'] = search_text
-    if tags: params['tags'] = tags
-    if status: params['status'] = status
-    if due_after: params['due_after'] = due_after
-    if due_before: params['due_before'] = due_before
-    return _request("get", "/tasks/", params=params)
-    
+    params = _compact(_CREATE_TASK_KEYS, (for_user, title, status, description, due_date, rrule, tags))
+    return _write_request("post", "/tasks/", params=params)
+
+get_tasks = _make_query("get_tasks", "/tasks/", [
+    ("for_user", _REQUIRED), ("search_text", None), ("tags", None), ("status", None), ("due_after", None), ("due_before", None),
+    ("match_mode", "and"),
+])
+
 def update_task(task_id: int, title: Optional[str] = None, description: Optional[str] = None, status: Optional[str] = None, due_date: Optional[str] = None, rrule: Optional[str] = None, tags: Optional[List[str]] = None, for_user: Optional[str] = None):
-    params = {}
-    if title: params['title'] = title
-    if description: params['description'] = description
-    if status: params['status'] = status
-    if due_date: params['due_date'] = due_date
-    if rrule: params['rrule'] = rrule
-    if tags: params['tags'] = tags
+    params = _compact(_UPDATE_TASK_KEYS, (title, description, status, due_date, rrule, tags))
     if not params: return {"status": "info", "message": "No fields provided to update."}
-    return _request("put", f"/tasks/{task_id}", params=params)
+    return _write_request("put", f"/tasks/{task_id}", params=params)
 
-def delete_task(task_id: int, for_user: Optional[str] = None):
-    return _request("delete", f"/tasks/{task_id}")
+delete_task = _make_by_id("delete_task", "delete", "/tasks/", "task_id")
+delete_tasks = _make_bulk_delete("delete_tasks", "/tasks/", "task_ids")
 
 # CALENDAR
+_CREATE_EVENT_KEYS = ("for_user", "title", "start_time", "end_time", "description", "rrule", "tags")
+_UPDATE_EVENT_KEYS = ("title", "start_time", "end_time", "description", "rrule", "tags")
+
 def create_event(for_user: str, title: str, start_time: str, end_time: Optional[str] = None, description: Optional[str] = None, rrule: Optional[str] = None, tags: Optional[List[str]] = None):
-    params = {"for_user": for_user, "title": title, "start_time": start_time}
-    if end_time: params['end_time'] = end_time
-    if description: params['description'] = description
-    if rrule: params['rrule'] = rrule
-    if tags: params['tags'] = tags
-    return _request("post", "/calendar/", params=params)
-
-def get_event_by_id(event_id: int, for_user: Optional[str] = None):
-    return _request("get", f"/calendar/{event_id}")
-    
-def query_events(for_user: str, search_text: Optional[str] = None, tags: Optional[List[str]] = None, start_after: Optional[str] = None, end_before: Optional[str] = None, match_mode: str = "and"):
-    params = {"for_user": for_user, "match_mode": match_mode}
-    if search_text: params['search_text'] = search_text
-    if tags: params['tags'] = tags
-    if start_after: params['start_after'] = start_after
-    if end_before: params['end_before'] = end_before
-    return _request("get", "/calendar/", params=params)
+    params = _compact(_CREATE_EVENT_KEYS, (for_user, title, start_time, end_time, description, rrule, tags))
+    return _write_request("post", "/calendar/", params=params)
+
+get_event_by_id = _make_by_id("get_event_by_id", "get", "/calendar/", "event_id")
+
+query_events = _make_query("query_events", "/calendar/", [
+    ("for_user", _REQUIRED), ("search_text", None), ("tags", None), ("start_after", None), ("end_before", None), ("match_mode", "and"),
+])
 
 def update_event(event_id: int, title: Optional[str] = None, start_time: Optional[str] = None, end_time: Optional[str] = None, description: Optional[str] = None, rrule: Optional[str] = None, tags: Optional[List[str]] = None, for_user: Optional[str] = None):
-    params = {}
-    if title: params['title'] = title
-    if start_time: params['start_time'] = start_time
-    if end_time: params['end_time'] = end_time
-    if description: params['description'] = description
-    if rrule: params['rrule'] = rrule
-    if tags: params['tags'] = tags
+    params = _compact(_UPDATE_EVENT_KEYS, (title, start_time, end_time, description, rrule, tags))
     if not params: return {"status": "info", "message": "No fields provided to update."}
-    return _request("put", f"/calendar/{event_id}", params=params)
+    return _write_request("put", f"/calendar/{event_id}", params=params)
+
+delete_event = _make_by_id("delete_event", "delete", "/calendar/", "event_id")
+delete_events = _make_bulk_delete("delete_events", "/calendar/", "event_ids")
+
+# --- Tool Dispatch ---
+_JSON_SCHEMA_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool}
+
+def _schema_type(schema):
+    """Python type of a property in the tools' JSON Schema"""
+    if "enum" in schema:
+        return Literal[tuple(schema["enum"])]
+    if schema.get("type") == "array":
+        return List[_schema_type(schema.get("items", {}))]
+    return _JSON_SCHEMA_TYPES.get(schema.get("type"), Any)
 
-def delete_event(event_id: int, for_user: Optional[str] = None):
-    return _request("delete", f"/calendar/{event_id}")
\ No newline at end of file
+def _tool_adapter(name, schema):
+    """Validator of a tool's arguments, built from its parameters schema"""
+    parameters = schema["parameters"]
+    required = set(parameters.get("required", []))
+    fields = {
+        param: (_schema_type(prop), ...) if param in required else (Optional[_schema_type(prop)], None)
+        for param, prop in parameters["properties"].items()
+    }
+    return TypeAdapter(create_model(name, **fields))
+
+# Worked out once from the schema, every lookup by tool name is a dict access: its schema, its wrapper, whether it
+# takes the user to act for and the validator of its arguments
+functions_by_name = {tool["function"]["name"]: tool["function"] for tool in functions}
+tool_names = frozenset(functions_by_name)
+read_only_tools = frozenset(name for name in tool_names if name.startswith(("get_", "query_")))
+tool_functions = {name: globals()[name] for name in functions_by_name}
+tools_for_user = frozenset(name for name, fn in tool_functions.items() if "for_user" in inspect.signature(fn).parameters)
+tool_adapters = {name: _tool_adapter(name, schema) for name, schema in functions_by_name.items()}
+
+# The dispatch table of the bot, all of the above for a tool in one lookup as (wrapper, validator, takes for_user)
+tool_dispatch = {name: (tool_functions[name], tool_adapters[name], name in tools_for_user) for name in tool_names}
+
+def validate_tool_args(name, args):
+    """Arguments of a tool call, as JSON text or already decoded, checked and coerced to the tool's schema.
+    Only the arguments the LLM gave are returned, so the wrappers' defaults still apply. Raises pydantic.ValidationError."""
+    return validate_args(tool_adapters[name], args)
+
+def validate_args(adapter, args):
+    """Arguments checked with a tool's validator, see validate_tool_args"""
+    if isinstance(args, (str, bytes)):
+        validated = adapter.validate_json(args)
+    else:
+        validated = adapter.validate_python(args or {})
+    return validated.model_dump(exclude_unset=True)
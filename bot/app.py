@@ -3,15 +3,25 @@
 import telebot
 import openai
 import tiktoken
+from openai.types.chat import ChatCompletionMessage
+import pydantic
 import logging
+import functools
 import api
 import os
-import json
+import orjson
 import re
 import requests
 from datetime import datetime
+from string import Template
 import html
 import traceback
+import base64
+import msgpack
+import zstandard
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Env vars from docker compose
 telegram_key = os.environ.get('TELEGRAM_API_KEY')
@@ -25,8 +35,21 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 # Setup telegram
+# Messages are handled on a pool of worker threads, one user's LLM and API waits don't hold up the others
+HANDLER_THREADS = int(os.environ.get('BOT_HANDLER_THREADS', '8'))
 logger.info("Initializing Telegram API")
-organizr_bot = telebot.TeleBot(telegram_key)
+organizr_bot = telebot.TeleBot(telegram_key, threaded=True, num_threads=HANDLER_THREADS)
+_user_locks = {}
+_user_locks_lock = threading.Lock()
+
+# Each getUpdates call is held open by Telegram for up to LONG_POLLING_TIMEOUT seconds until a message arrives, so an
+# idle bot polls about once a minute and new messages are still delivered right away
+LONG_POLLING_TIMEOUT = 50
+POLLING_TIMEOUT = 60
+
+# Setup Deepgram, one session so voice messages reuse the connection instead of a new TLS handshake each
+deepgram_session = requests.Session()
+deepgram_session.headers.update({"Authorization": f"Token {deepgram_key}", "Content-Type": "audio/*"})
 
 # Setup openapi compatible LLM
 logger.info("Initializing LLM API")
@@ -35,6 +58,38 @@ llm = openai.OpenAI(
     api_key=openai_key
 )
 
+# Token encoder for the history budget, loading it reads and builds the BPE ranks so it's done once
+try:
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENC = tiktoken.encoding_for_model("gpt-4o") # Fallback
+
+# Tool calls of one LLM response are independent of each other, they run side by side over the pooled api session
+TOOL_CALL_WORKERS = 8
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix="tool-call")
+
+# Sampling temperature of the LLM
+LLM_TEMPERATURE = float(os.environ.get('LLM_TEMPERATURE', '0.1'))
+
+# Internal API ID of the admin user, filled in on startup by get_admin_internal_id
+_admin_internal_id = None
+
+# Reports of the tool calls of one LLM response are sent together, split into messages of at most this many characters.
+# They go out on their own thread, one at a time so they keep their order, and are waited for before the answer is
+# shown so they never arrive after it. DEBUG_TOOL_CALLS=0 turns them off.
+DEBUG_TOOL_CALLS = os.environ.get('DEBUG_TOOL_CALLS', '1') != '0'
+TOOL_REPORT_MAX_LEN = 3500
+report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-report")
+
+# Answers are streamed into their reply, which is edited at most this often (seconds) while the LLM writes.
+# Telegram rate limits edits of a message to about one per second and caps its text at 4096 characters,
+# longer answers stop being streamed at STREAM_MAX_LEN and only show up with the final edit
+STREAM_EDIT_INTERVAL = 1.0
+STREAM_MAX_LEN = 3900
+
+# Tool definitions sent with every LLM request, frozen once so each request hands the SDK the same immutable sequence
+LLM_TOOLS = tuple(api.functions)
+
 SENSITIVE_ENV_VARS = [
     # Known keys used by this project
     "TELEGRAM_API_KEY", "OPENAI_API_KEY", "OPENAI_BASE_URL", "OPENAI_MODEL",
@@ -65,6 +120,14 @@ def _collect_secret_values() -> list:
         values.add(deepgram_key)
     return sorted(values, key=len, reverse=True)
 
+# The environment doesn't change while the bot runs, so its secrets are collected once into a single alternation,
+# longest first so a secret containing another is redacted whole
+_SECRET_VALUES = _collect_secret_values()
+_SECRET_PATTERN = re.compile("|".join(map(re.escape, _SECRET_VALUES))) if _SECRET_VALUES else None
+_JWT_PATTERN = re.compile(r"\b[\w-]+\.[\w-]+\.[\w-]+\b")
+_HEX_PATTERN = re.compile(r"\b[a-f0-9]{32,}\b", re.I)
+_BASE64_PATTERN = re.compile(r"\b[A-Za-z0-9+/]{40,}={0,2}\b")
+
 def sanitize_text(text: str, max_len: int = 1500) -> str:
     """Redact sensitive values and trim length for safe Telegram display.
     - Redacts any env var values collected by _collect_secret_values.
@@ -75,15 +138,14 @@ def sanitize_text(text: str, max_len: int = 1500) -> str:
         return ""
     try:
         redacted = str(text)
-        # redact env var values
-        for secret in _collect_secret_values():
-            if secret and secret in redacted:
-                redacted = redacted.replace(secret, "***REDACTED***")
+        # redact env var values, all of them in one pass
+        if _SECRET_PATTERN is not None:
+            redacted = _SECRET_PATTERN.sub("***REDACTED***", redacted)
         # redact obvious JWT-like tokens (three base64url segments)
-        redacted = re.sub(r"\b[\w-]+\.[\w-]+\.[\w-]+\b", "***REDACTED-TOKEN***", redacted)
+        redacted = _JWT_PATTERN.sub("***REDACTED-TOKEN***", redacted)
         # redact long hex/base64 strings that look like keys (32+ chars)
-        redacted = re.sub(r"\b[a-f0-9]{32,}\b", "***REDACTED-HEX***", redacted, flags=re.I)
-        redacted = re.sub(r"\b[A-Za-z0-9+/]{40,}={0,2}\b", "***REDACTED-BASE64***", redacted)
+        redacted = _HEX_PATTERN.sub("***REDACTED-HEX***", redacted)
+        redacted = _BASE64_PATTERN.sub("***REDACTED-BASE64***", redacted)
         # avoid breaking Markdown code blocks; strip backticks excess
         redacted = redacted.replace("```", "`\u200b``")
         # final truncate
@@ -118,10 +180,6 @@ def transcribe_voice_message(voice_file_content):
     
     try:
         url = "https://api.deepgram.com/v1/listen"
-        headers = {
-            "Authorization": f"Token {deepgram_key}",
-            "Content-Type": "audio/*"
-        }
         
         # Add query parameters for better transcription
         params = {
@@ -134,7 +192,7 @@ def transcribe_voice_message(voice_file_content):
         }
         
         logger.info("Sending voice message to Deepgram for transcription")
-        response = requests.post(url, headers=headers, data=voice_file_content, params=params)
+        response = deepgram_session.post(url, data=voice_file_content, params=params)
         
         if response.status_code == 200:
             result = response.json()
@@ -154,6 +212,9 @@ def transcribe_voice_message(voice_file_content):
         logger.error(f"Error transcribing voice message: {e}", exc_info=True)
         return None
 
+# Placeholders are closed by a NUL as well, so text right after one (like the 2 in `H`2O) is never taken as part of it
+_PLACEHOLDER_PATTERN = re.compile("\x00PH\\d+\x00")
+
 def parse_md_to_telegram_html(text: str) -> str:
     """
     Parses a subset of Markdown and converts it to Telegram-compatible HTML.
@@ -165,8 +226,8 @@ def parse_md_to_telegram_html(text: str) -> str:
     # Placeholders for content that needs protection from other parsing rules
     placeholders = {}
     def add_placeholder(key, value):
-        # Using a dash-based placeholder to avoid conflict with markdown's underscores for bold/italic
-        ph_key = f"PLACEHOLDER-{key}-{len(placeholders)}"
+        # Delimited by NUL characters, which neither markdown's rules nor the html escaping touch
+        ph_key = f"\x00PH{len(placeholders)}\x00"
         placeholders[ph_key] = value
         return ph_key
 
@@ -221,12 +282,19 @@ def parse_md_to_telegram_html(text: str) -> str:
     processed_text = re.sub(r'^\s*[\*\-]\s+(.*)', r'• \1', processed_text, flags=re.MULTILINE)
     processed_text = re.sub(r'^\s*(\d+)\.\s+(.*)', r'\1. \2', processed_text, flags=re.MULTILINE)
 
-    # 5. Restore all protected content
-    for ph_key, ph_value in placeholders.items():
-        processed_text = processed_text.replace(ph_key, ph_value)
+    # 5. Restore all protected content in one pass
+    if placeholders:
+        processed_text = _PLACEHOLDER_PATTERN.sub(lambda m: placeholders.get(m.group(0), m.group(0)), processed_text)
         
     return processed_text.strip()
 
+def get_admin_internal_id():
+    """Internal API ID of the admin, who owns the chat history notes. It never changes, so it's looked up once."""
+    global _admin_internal_id
+    if _admin_internal_id is None:
+        _admin_internal_id = api.id_to_internal("admin")
+    return _admin_internal_id
+
 def run_bot():
     """Start the telegram bot with checks, preparations and then the final infinite polling"""
     logger.info("Checking API health")
@@ -249,10 +317,22 @@ def run_bot():
     if not api.check_user_exists_in_app("admin"):
         logger.info("Admin user not found in API. Creating and linking admin.")
         api.create_and_link_user("admin")
+    get_admin_internal_id()
         
+    logger.info("Warming up API connections")
+    api.warmup()
+
     logger.info("Starting Telegram polling")
-    organizr_bot.infinity_polling()
+    organizr_bot.infinity_polling(timeout=POLLING_TIMEOUT, long_polling_timeout=LONG_POLLING_TIMEOUT)
+
 
+def _user_lock(telegram_id):
+    """Lock of a Telegram user, other users' messages are handled side by side"""
+    with _user_locks_lock:
+        lock = _user_locks.get(telegram_id)
+        if lock is None:
+            lock = _user_locks[telegram_id] = threading.Lock()
+        return lock
 
 @organizr_bot.message_handler(content_types=['text', 'voice'])
 def message_entrypoint(message):
@@ -260,79 +340,68 @@ def message_entrypoint(message):
     user_id_str = str(message.from_user.id)
     logger.info(f"Received {message.content_type} message from Telegram user ID {user_id_str}")
 
-    try:
-        if not api.check_user_exists_in_app(user_id_str):
-            logger.info(f"User {user_id_str} not found in API. Creating new user and link.")
-            api.create_and_link_user(user_id_str)
-            organizr_bot.send_message(message.chat.id, "✅ *Welcome!* You have been successfully registered as a new user.", parse_mode='Markdown')
+    # Messages of one user are handled one at a time, they share the registration and the chat history note
+    with _user_lock(user_id_str):
+        try:
+            if not api.check_user_exists_in_app(user_id_str):
+                logger.info(f"User {user_id_str} not found in API. Creating new user and link.")
+                api.create_and_link_user(user_id_str)
+                organizr_bot.send_message(message.chat.id, "✅ *Welcome!* You have been successfully registered as a new user.", parse_mode='Markdown')
         
-        # Handle voice messages
-        if message.content_type == 'voice':
-            try:
-                # Get voice message info
-                voice = message.voice
-                logger.info(f"Processing voice message: {voice.duration}s, {voice.file_size} bytes")
-
-                # Download the voice file
-                file_info = organizr_bot.get_file(voice.file_id)
-                downloaded_file = organizr_bot.download_file(file_info.file_path)
-
-                # Transcribe the voice message
-                transcribed_text = transcribe_voice_message(downloaded_file)
-
-                if transcribed_text:
-                    # Process the transcribed text
-                    handle_message(message, message_text=transcribed_text)
-                else:
-                    organizr_bot.reply_to(message, "❌ _Sorry, I couldn't transcribe your voice message. Please try again or send a text message._", parse_mode='Markdown')
-
-            except Exception as e:
-                logger.error(f"Error processing voice message: {e}", exc_info=True)
-                organizr_bot.reply_to(message, build_error_report("Error processing voice message", e), parse_mode='Markdown')
-        else:
-            # Handle text messages normally
-            handle_message(message)
+            # Handle voice messages
+            if message.content_type == 'voice':
+                try:
+                    # Get voice message info
+                    voice = message.voice
+                    logger.info(f"Processing voice message: {voice.duration}s, {voice.file_size} bytes")
+
+                    # Download the voice file
+                    file_info = organizr_bot.get_file(voice.file_id)
+                    downloaded_file = organizr_bot.download_file(file_info.file_path)
+
+                    # Transcribe the voice message
+                    transcribed_text = transcribe_voice_message(downloaded_file)
+
+                    if transcribed_text:
+                        # Process the transcribed text
+                        handle_message(message, message_text=transcribed_text)
+                    else:
+                        organizr_bot.reply_to(message, "❌ _Sorry, I couldn't transcribe your voice message. Please try again or send a text message._", parse_mode='Markdown')
+
+                except Exception as e:
+                    logger.error(f"Error processing voice message: {e}", exc_info=True)
+                    organizr_bot.reply_to(message, build_error_report("Error processing voice message", e), parse_mode='Markdown')
+            else:
+                # Handle text messages normally
+                handle_message(message)
 
-    except Exception as e:
-        logger.error(f"An error occurred while handling message for user {user_id_str}: {e}", exc_info=True)
-        organizr_bot.send_message(message.chat.id, build_error_report("Unexpected error while handling your message", e), parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"An error occurred while handling message for user {user_id_str}: {e}", exc_info=True)
+            organizr_bot.send_message(message.chat.id, build_error_report("Unexpected error while handling your message", e), parse_mode='Markdown')
 
 def normalize_message_obj(m):
     """
     Return a JSON-serializable dict for a message-like object.
     Accepts:
       - plain dicts (returned unchanged)
-      - pydantic/OpenAI response objects (via model_dump/model_dump_json/.dict)
-      - simple objects with attributes (role, content, name, id, tool_calls, ...)
+      - pydantic/OpenAI response objects (via model_dump/.dict)
+      - simple objects with attributes (role, content, tool_calls)
+    Whatever can't be serialized fails where the history is stored.
     """
     if isinstance(m, dict):
         return m
-    # pydantic v2 style
-    if hasattr(m, "model_dump"):
-        try:
-            return m.model_dump(mode="json")
-        except Exception:
-            # fallback
-            return m.model_dump() if hasattr(m, "model_dump") else {}
-    # older pydantic / other object fallback
-    if hasattr(m, "dict"):
-        try:
-            return m.dict()
-        except Exception:
-            pass
-    # last resort: pull likely attributes
-    out = {}
-    for attr in ("role", "content", "name", "id", "tool_call_id", "tool_calls"):
-        if hasattr(m, attr):
-            out[attr] = getattr(m, attr)
-    # if content is a nested pydantic model list/obj, try to serialize
-    try:
-        json.dumps(out)  # test-serializable
-        return out
-    except Exception:
-        # as a final fallback return stringified object for content
-        return {"role": getattr(m, "role", "assistant"), "content": str(getattr(m, "content", m))}
-    
+    model_dump = getattr(m, "model_dump", None)
+    if model_dump is not None:
+        return model_dump(mode="json")
+    as_dict = getattr(m, "dict", None)
+    if as_dict is not None:
+        return as_dict()
+    return {
+        "role": getattr(m, "role", "assistant"),
+        "content": getattr(m, "content", None),
+        "tool_calls": getattr(m, "tool_calls", None),
+    }
+
 def handle_message(msg, message_text=None):
     """Main logic to process a message: load history, call LLM, handle tools, and save history."""
     telegram_id = str(msg.from_user.id)
@@ -341,25 +410,29 @@ def handle_message(msg, message_text=None):
     # Use provided message_text or extract from message object
     text_content = message_text if message_text is not None else msg.text
 
+    admin_internal_id = get_admin_internal_id()
+    if not admin_internal_id:
+        logger.error("Could not find internal ID for admin user.")
+        organizr_bot.send_message(chat_id, "❌ *Critical error:* _Admin account not found. Please contact the administrator._", parse_mode='Markdown')
+        return
+
+    # The chat history is loaded while the user's internal ID is looked up, neither needs the other
+    logger.info(f"Loading chat history for Telegram ID {telegram_id}")
+    history_future = tool_executor.submit(api.get_notes, for_user=admin_internal_id, title=telegram_id)
+
     # Get internal API user ID
     internal_user_id = api.id_to_internal(telegram_id)
     if not internal_user_id:
         logger.error(f"Could not translate telegram ID {telegram_id} to internal ID.")
         organizr_bot.send_message(chat_id, "❌ _There was an issue identifying your user account. Cannot proceed._", parse_mode='Markdown')
         return
-    
-    admin_internal_id = api.id_to_internal("admin")
-    if not admin_internal_id:
-        logger.error("Could not find internal ID for admin user.")
-        organizr_bot.send_message(chat_id, "❌ *Critical error:* _Admin account not found. Please contact the administrator._", parse_mode='Markdown')
-        return
 
-    # Load chat history
-    logger.info(f"Loading chat history for user {internal_user_id} (from Telegram ID {telegram_id})")
-    notes_response = api.get_notes(for_user=admin_internal_id, title=telegram_id)
+    notes_response = history_future.result()
     
     messages = []
     note_id = None
+    # The turn's messages are appended to the note, unless it has to be written anew
+    rewrite_history = True
     if notes_response and isinstance(notes_response, list) and len(notes_response) > 0:
         if len(notes_response) > 1:
             logger.warning(f"Found multiple chat history notes for user {telegram_id}. Using the first one.")
@@ -368,34 +441,37 @@ def handle_message(msg, message_text=None):
         try:
             content = note.get("content", "[]")
             if content:
-                messages = json.loads(content)
+                messages = decode_history(content)
                 if not isinstance(messages, list):
                     logger.warning(f"Chat history for user {telegram_id} is not a list. Resetting.")
                     messages = []
-        except (json.JSONDecodeError, TypeError):
+            rewrite_history = not is_history_log(content or "")
+        except (orjson.JSONDecodeError, TypeError, ValueError, msgpack.UnpackException, zstandard.ZstdError):
             logger.error(f"Failed to parse chat history for user {telegram_id}. Starting fresh.")
             messages = []
     else:
         logger.info(f"No chat history note found for user {telegram_id}. A new one will be created.")
 
-    # Truncate messages to fit token limit
+    # Truncate messages to fit token limit, the note then only keeps what's left
+    loaded_count = len(messages)
     messages = truncate_messages(messages)
+    history_count = len(messages)
+    if history_count < loaded_count:
+        rewrite_history = True
 
-    # Add system message at start and user message at end
-    messages.insert(0, {"role": "system", "content": get_system_message(msg, internal_user_id)})
+    # Add the static system message at start, the turn's context and the user message at end
+    messages.insert(0, {"role": "system", "content": get_system_message()})
+    messages.append(get_context_message(msg, internal_user_id))
     messages.append({"role": "user", "content": text_content})
 
     # Main loop for LLM interaction and tool calls
+    streamed_reply = None
+    pending_reports = []
     while True:
         try:
             logger.info(f"Sending request to LLM for user {internal_user_id}. Message count: {len(messages)}")
-            request = llm.chat.completions.create(
-                model=openai_model,
-                messages=messages,
-                tools=api.functions,
-                temperature=0.1,
-            )
-            response_message = request.choices[0].message
+            llm_messages = [_llm_message(m) for m in messages]
+            response_message, streamed_reply = stream_completion(llm_messages, msg, pending_reports)
             response_message_dict = normalize_message_obj(response_message)
             messages.append(response_message_dict)
 
@@ -408,32 +484,14 @@ def handle_message(msg, message_text=None):
 
             if tool_calls:
                 logger.info(f"LLM requested {len(tool_calls)} tool call(s).")
-                for tool_call in tool_calls:
-                    fn_name = getattr(tool_call.function, "name", None) or tool_call.get("function", {}).get("name")
-                    args_str = getattr(tool_call.function, "arguments", None) or tool_call.get("function", {}).get("arguments")
-                    
-                    try:
-                        function_to_call = getattr(api, fn_name)
-                        args = json.loads(args_str) if isinstance(args_str, str) else (args_str or {})
-                        
-                        # Log the tool call with arguments
-                        arg_string = ', '.join(f'{k}={repr(v)}' for k, v in args.items())
-                        tool_call_info = f"{fn_name}({arg_string})"
-                        logger.info(f"Executing tool: {tool_call_info}")
-                        
-                        if "for_user" in function_to_call.__code__.co_varnames:
-                            args['for_user'] = internal_user_id
-                        result = function_to_call(**args)
-                    except AttributeError:
-                        logger.error(f"Function {fn_name} not found in api.py.")
-                        result = f"Error: Function {fn_name} not found."
-                    except json.JSONDecodeError:
-                        logger.error(f"Invalid JSON in arguments: {args_str}")
-                        result = "Error: Invalid function arguments format."
-                    except Exception as e:
-                        logger.error(f"Error executing function {fn_name}({args_str}): {e}", exc_info=True)
-                        result = f"Error: {e}"
+                if len(tool_calls) == 1:
+                    executed = [execute_tool_call(tool_calls[0], internal_user_id)]
+                else:
+                    executed = run_tool_calls(tool_calls, internal_user_id)
 
+                # Results are reported in the order the LLM requested the calls
+                tool_reports = []
+                for tool_call, (fn_name, tool_call_info, result) in zip(tool_calls, executed):
                     messages.append({
                         "role": "tool",
                         "tool_call_id": getattr(tool_call, "id", tool_call.get("id") if isinstance(tool_call, dict) else None),
@@ -443,26 +501,34 @@ def handle_message(msg, message_text=None):
                     
                     # Let the user know what tool is being executed
                     result_str = sanitize_text(str(result), max_len=1200)
-                    tool_exec_msg = f"⚙️ Executed: {sanitize_text(tool_call_info, max_len=300)}\n\nResult:\n{result_str}"
-                    organizr_bot.send_message(chat_id, f"```\n{tool_exec_msg}\n```", parse_mode='Markdown')
+                    tool_reports.append(f"⚙️ Executed: {sanitize_text(tool_call_info, max_len=300)}\n\nResult:\n{result_str}")
+                pending_reports.extend(send_tool_reports(chat_id, tool_reports))
 
             else:
                 # No more tool calls, final answer
                 final_content = response_message_dict.get("content") or ""
                 logger.info(f"Final response for user {internal_user_id}: \"{final_content}\"")
 
-                # Save all messages that arent the dynamic system message
+                # Save all messages that arent the system or context message
                 messages_to_store = [m for m in messages if m.get("role") != "system"]
+                for m in messages_to_store:
+                    _message_tokens(m)
 
-                if note_id:
-                    api.update_note(note_id=note_id, new_content=json.dumps(messages_to_store))
+                if note_id and not rewrite_history:
+                    api.append_to_note(note_id, "\n" + encode_history(messages_to_store[history_count:]))
+                elif note_id:
+                    api.update_note(note_id=note_id, new_content=encode_history(messages_to_store), is_log=True)
                 else:
-                    api.create_note(for_user=admin_internal_id, title=telegram_id, content=json.dumps(messages_to_store))
+                    api.create_note(for_user=admin_internal_id, title=telegram_id, content=encode_history(messages_to_store), is_log=True)
                 
                 # Convert basic markdown to Telegram-safe HTML using the custom parser
                 telegram_safe_html = parse_md_to_telegram_html(final_content)
                 
-                organizr_bot.reply_to(msg, telegram_safe_html, parse_mode='HTML')
+                flush_tool_reports(pending_reports)
+                if streamed_reply is None:
+                    organizr_bot.reply_to(msg, telegram_safe_html, parse_mode='HTML')
+                else:
+                    finish_streamed_reply(streamed_reply, telegram_safe_html)
                 break
 
         except Exception as e:
@@ -471,9 +537,164 @@ def handle_message(msg, message_text=None):
             break
 
 
-def get_system_message(msg, internal_user_id):
-    """Generates the detailed system message for the LLM."""
-    base_message = """You are organizr-bot, a helpful and efficient Telegram Bot acting as a personal assistant for the user. Your main purpose is to interact with the organizr-api to manage the user's notes, tasks, and calendar events.
+def stream_completion(llm_messages, msg, pending_reports):
+    """
+    Request the next LLM message as a stream. Text is shown to the user while it arrives, as a reply to msg that is
+    edited at most every STREAM_EDIT_INTERVAL seconds, tool call deltas are merged into complete calls.
+    Returns the message as the API would have without streaming and the reply shown so far (None if nothing was shown).
+    Failed edits are skipped, the next one or the final answer catches up. The reply waits for pending_reports.
+    """
+    stream = llm.chat.completions.create(
+        model=openai_model,
+        messages=llm_messages,
+        tools=LLM_TOOLS,
+        temperature=LLM_TEMPERATURE,
+        stream=True,
+    )
+    parts = []
+    tool_calls = {}
+    reply = None
+    shown = ""
+    last_edit = time.monotonic()
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        for call_delta in delta.tool_calls or []:
+            call = tool_calls.setdefault(call_delta.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+            if call_delta.id:
+                call["id"] = call_delta.id
+            if call_delta.function:
+                call["function"]["name"] += call_delta.function.name or ""
+                call["function"]["arguments"] += call_delta.function.arguments or ""
+        if delta.content:
+            parts.append(delta.content)
+            # Only answers are shown while streaming, the text of a turn calling tools is shown with its results
+            now = time.monotonic()
+            if not tool_calls and now - last_edit >= STREAM_EDIT_INTERVAL:
+                text = "".join(parts)
+                if text.strip() and text != shown and len(text) <= STREAM_MAX_LEN:
+                    try:
+                        if reply is None:
+                            flush_tool_reports(pending_reports)
+                            reply = organizr_bot.reply_to(msg, text)
+                        else:
+                            organizr_bot.edit_message_text(text, reply.chat.id, reply.message_id)
+                        shown = text
+                    except telebot.apihelper.ApiTelegramException as e:
+                        logger.warning(f"Skipping an update of the streamed reply: {e}")
+                last_edit = now
+
+    # Text streamed before the LLM decided to call tools is not the answer, it is shown with the tool results instead
+    if tool_calls and reply is not None:
+        try:
+            organizr_bot.delete_message(reply.chat.id, reply.message_id)
+        except telebot.apihelper.ApiTelegramException as e:
+            logger.warning(f"Could not delete the streamed reply: {e}")
+        reply = None
+
+    message = ChatCompletionMessage.model_validate({
+        "role": "assistant",
+        "content": "".join(parts) or None,
+        "tool_calls": [tool_calls[index] for index in sorted(tool_calls)] or None,
+    })
+    return message, reply
+
+def finish_streamed_reply(reply, telegram_safe_html):
+    """Replace the text streamed into the reply with the final, formatted answer"""
+    try:
+        organizr_bot.edit_message_text(telegram_safe_html, reply.chat.id, reply.message_id, parse_mode='HTML')
+    except telebot.apihelper.ApiTelegramException as e:
+        # Nothing changed since the last edit
+        if "message is not modified" not in str(e):
+            raise
+
+def run_tool_calls(tool_calls, internal_user_id):
+    """
+    Run the tool calls of one LLM response, returns their (function name, call description, result) in request order.
+    The read-only calls run side by side first, the calls changing data follow one after another in the requested order.
+    """
+    executed = [None] * len(tool_calls)
+    reads = [i for i, tool_call in enumerate(tool_calls) if tool_call.function.name in api.read_only_tools]
+    writes = [i for i, tool_call in enumerate(tool_calls) if tool_call.function.name not in api.read_only_tools]
+    for i, result in zip(reads, tool_executor.map(lambda i: execute_tool_call(tool_calls[i], internal_user_id), reads)):
+        executed[i] = result
+    for i in writes:
+        executed[i] = execute_tool_call(tool_calls[i], internal_user_id)
+    return executed
+
+def send_tool_reports(chat_id, reports):
+    """
+    Send the reports of the executed tool calls in as few messages as fit, to stay clear of Telegram's rate limits.
+    They are sent in the background, the LLM loop doesn't wait for Telegram. Nothing is sent unless DEBUG_TOOL_CALLS is set.
+    Returns the futures of the messages, for flush_tool_reports.
+    """
+    if not DEBUG_TOOL_CALLS:
+        return []
+    futures = []
+    batch = []
+    batch_len = 0
+    for report in reports:
+        if batch and batch_len + len(report) > TOOL_REPORT_MAX_LEN:
+            futures.append(report_executor.submit(_send_tool_report, chat_id, "\n\n".join(batch)))
+            batch, batch_len = [], 0
+        batch.append(report)
+        batch_len += len(report) + 2
+    if batch:
+        futures.append(report_executor.submit(_send_tool_report, chat_id, "\n\n".join(batch)))
+    return futures
+
+def flush_tool_reports(pending_reports):
+    """Wait until the tool reports sent so far are out, so the answer shows up after them"""
+    if pending_reports:
+        wait(pending_reports)
+        pending_reports.clear()
+
+def _send_tool_report(chat_id, text):
+    try:
+        organizr_bot.send_message(chat_id, f"```\n{text}\n```", parse_mode='Markdown')
+    except Exception as e:
+        logger.error(f"Failed to send tool report to chat {chat_id}: {e}")
+
+def execute_tool_call(tool_call, internal_user_id):
+    """Run one tool call of the LLM against the api, returns (function name, call description, result)"""
+    fn_name = tool_call.function.name
+    args_str = tool_call.function.arguments
+    tool_call_info = f"{fn_name}({args_str})"
+
+    # Only the tools in the schema can be called, everything needed to run one is looked up at once
+    dispatch = api.tool_dispatch.get(fn_name)
+    if dispatch is None:
+        logger.error(f"Function {fn_name} not found in api.py.")
+        return fn_name, tool_call_info, f"Error: Function {fn_name} not found."
+    function_to_call, adapter, takes_user = dispatch
+
+    try:
+        args = api.validate_args(adapter, args_str)
+
+        # Log the tool call with arguments
+        arg_string = ', '.join(f'{k}={repr(v)}' for k, v in args.items())
+        tool_call_info = f"{fn_name}({arg_string})"
+        logger.info(f"Executing tool: {tool_call_info}")
+
+        if takes_user:
+            args['for_user'] = internal_user_id
+        result = function_to_call(**args)
+    except pydantic.ValidationError as e:
+        logger.error(f"Invalid arguments for {fn_name}: {args_str}")
+        result = f"Error: Invalid function arguments: {e}"
+    except Exception as e:
+        logger.error(f"Error executing function {fn_name}({args_str}): {e}", exc_info=True)
+        result = f"Error: {e}"
+
+    return fn_name, tool_call_info, result
+
+
+@functools.lru_cache(maxsize=1)
+def get_system_message():
+    """The detailed system message for the LLM. It is the same text on every call, so the LLM backend can reuse its
+    cached prompt prefix, everything that changes per turn goes into get_context_message."""
+    return """You are organizr-bot, a helpful and efficient Telegram Bot acting as a personal assistant for the user. Your main purpose is to interact with the organizr-api to manage the user's notes, tasks, and calendar events.
 
 ### Your Persona:
 - You are **casual, friendly, and conversational**. Use a tone appropriate for a chat app.
@@ -500,46 +721,89 @@ Your goal is to understand the user's natural language request and translate it
 - You can chain multiple tool calls. For example, a user might ask to "find the note about the project and add a new task to it." This would require a `get_notes` call first, followed by a `create_task` call.
 - The user is automatically informed about tool calls happening in the background, so you do not need to say "I am now calling the function...". You can simply state the result after the tool has been called.
 - If the user references something that you never heard about, you can also use the tools to provide context to yourself: You can query the users notes, tasks and calendar to find any needed information you need for yourself, tool calls aren't limited to providing aid to the user.
+- The current date and time, the user's first name and their internal API ID are given in a context message right before the user's latest message."""
 
-### Important Context:
+# Per-turn context for the LLM, filled in with one pass by get_context_message
+_CONTEXT_TEMPLATE = Template("""### Important Context:
 - The current date and time is: **$DATETIME**.
 - The user's first name is: **$USERNAME**.
-- You are operating on behalf of the user with internal API ID: **$ORGANIZRID**. You do not need to mention this ID to the user. All your tool calls will be automatically associated with this user."""
+- You are operating on behalf of the user with internal API ID: **$ORGANIZRID**. You do not need to mention this ID to the user. All your tool calls will be automatically associated with this user.""")
+
+def get_context_message(msg, internal_user_id):
+    """The per-turn context for the LLM, sent right before the user's message so everything in front of it stays cacheable."""
+    content = _CONTEXT_TEMPLATE.safe_substitute(
+        DATETIME=datetime.now().strftime("%d.%m.%Y %H:%M"),
+        USERNAME=msg.from_user.first_name,
+        ORGANIZRID=internal_user_id,
+    )
+    return {"role": "system", "content": content}
+
+# Chat histories are stored in their notes as an append-only log, one record per line. Each record holds the messages
+# of a turn as msgpack compressed with zstd, base64 encoded behind this marker. Notes without it hold the plain JSON of
+# older versions. The notes are marked as logs when written, which keeps them out of the API's content search.
+HISTORY_MAGIC = "ZM"
+HISTORY_ZSTD_LEVEL = 3
+
+def encode_history(messages):
+    """Messages as one record of the history log"""
+    packed = zstandard.compress(msgpack.packb(messages), HISTORY_ZSTD_LEVEL)
+    return HISTORY_MAGIC + base64.b64encode(packed).decode()
+
+def is_history_log(content):
+    """Whether a note holds the history log, records can only be appended to that format"""
+    return not content or content.startswith(HISTORY_MAGIC)
+
+def decode_history(content):
+    """Chat history read from the content of its note, the records of the log joined or the JSON of older versions"""
+    if not is_history_log(content):
+        return orjson.loads(content)
+    messages = []
+    for record in content.split("\n"):
+        if record:
+            packed = base64.b64decode(record[len(HISTORY_MAGIC):])
+            messages.extend(msgpack.unpackb(zstandard.decompress(packed)))
+    return messages
 
-    return base_message.replace("$DATETIME", datetime.now().strftime("%d.%m.%Y %H:%M:%S")) \
-        .replace("$USERNAME", msg.from_user.first_name) \
-        .replace("$ORGANIZRID", internal_user_id)
+def _message_tokens(msg):
+    """Approximate token count of one chat message, all of its values encoded in one batch.
+    The count is kept in the message under "_tok" and stored with the history, so every message is only encoded once."""
+    tokens = msg.get("_tok")
+    if tokens is None:
+        tokens = 4  # every message follows <im_start>{role/name}\n{content}<im_end>\n
+        tokens += sum(len(encoded) for encoded in _ENC.encode_batch([str(value) for value in msg.values()]))
+        if "name" in msg:  # if there's a name, the role is omitted
+            tokens -= 1  # role is 1 token
+        msg["_tok"] = tokens
+    return tokens
+
+def _llm_message(msg):
+    """The message as sent to the LLM, without the bookkeeping fields starting with an underscore"""
+    if "_tok" not in msg:
+        return msg
+    return {key: value for key, value in msg.items() if not key.startswith("_")}
+
+# Share of the token budget a history over it is cut down to. Cutting below the budget leaves room for a number of
+# turns before the next cut, each cut rewrites the whole history note while the turns in between are only appended.
+HISTORY_TRUNCATE_TO = 0.75
 
 def truncate_messages(messages, max_tokens=32000):
-    """Removes messages from the beginning of the list until the total token count is below the max."""
-    try:
-        enc = tiktoken.get_encoding("cl100k_base")
-    except Exception:
-        enc = tiktoken.encoding_for_model("gpt-4o") # Fallback
-
-    total_tokens = 0
-    for msg in messages:
-        total_tokens += 4  # every message follows <im_start>{role/name}\n{content}<im_end>\n
-        for key, value in msg.items():
-            total_tokens += len(enc.encode(str(value)))
-            if key == "name":  # if there's a name, the role is omitted
-                total_tokens -= 1  # role is 1 token
-
-    while total_tokens > max_tokens:
-        if not messages:
-            break
-        removed_message = messages.pop(0)
-        
-        # Recalculate tokens removed
-        removed_tokens = 4
-        for key, value in removed_message.items():
-            removed_tokens += len(enc.encode(str(value)))
-            if key == "name":
-                removed_tokens -= 1
-        total_tokens -= removed_tokens
-        logger.info(f"Truncating history. Removed one message to save ~{removed_tokens} tokens. New total: {total_tokens}")
-
-    return messages
+    """Removes messages from the beginning of the list once the total token count is above the max, until it is below
+    HISTORY_TRUNCATE_TO of the max."""
+    # The counts are stored with the messages, the oldest are dropped from a running total and cut off with one slice
+    counts = [_message_tokens(msg) for msg in messages]
+    total_tokens = sum(counts)
+    if total_tokens <= max_tokens:
+        return messages
+
+    target_tokens = max_tokens * HISTORY_TRUNCATE_TO
+    cut = 0
+    while total_tokens > target_tokens and cut < len(counts):
+        total_tokens -= counts[cut]
+        cut += 1
+
+    if cut:
+        logger.info(f"Truncating history. Removed {cut} message(s) to save ~{sum(counts[:cut])} tokens. New total: {total_tokens}")
+    return messages[cut:]
 
 if __name__ == '__main__':
     run_bot()
\ No newline at end of file
@@ -123,6 +123,20 @@ def test_query_and_search_events(test_user):
     # Assert that 5 new events (1 one-time + 4 recurring) were found on top of any pre-existing ones.
     assert len(events) == initial_count + 5
 
+    # OR mode matches either the text or a tag
+    response = client.get("/calendar/", params={
+        "search_text": "Appointment",
+        "tags": ["recurring"],
+        "match_mode": "or",
+        "start_after": query_start,
+        "end_before": query_end
+    }, headers={"X-API-Key": user_api_key})
+
+    assert response.status_code == 200
+    titles = [e["title"] for e in response.json()]
+    assert titles.count("Single Doctor's Appointment") == 1
+    assert titles.count("Weekly Team Sync") == 4
+
 def test_tag_management(test_user):
     """Test deleting a specific tag from an event."""
     client = TestClient(app)
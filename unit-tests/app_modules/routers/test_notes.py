@@ -83,6 +83,23 @@ def test_note_crud(test_user):
     assert response.status_code == 200
     assert len(response.json()) == 0
 
+def test_append_to_note(test_user):
+    """Test appending to a note's content."""
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+    note_id = client.post("/notes/", json={"title": "Log", "content": "first"}, headers={"X-API-Key": user_api_key}).json()["id"]
+
+    response = client.post(f"/notes/{note_id}/append", json={"content": "\nsecond"}, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    response = client.get("/notes/", params={"note_id": note_id}, headers={"X-API-Key": user_api_key})
+    assert response.json()[0]["content"] == "first\nsecond"
+
+    # Other users can't append
+    admin_api_key = unit_test_utils.manual_admin_key_override()
+    other_api_key = client.post("/users/", headers={"X-API-Key": admin_api_key}).json()["api_key"]
+    response = client.post(f"/notes/{note_id}/append", json={"content": "x"}, headers={"X-API-Key": other_api_key})
+    assert response.status_code == 403
+
 def test_query_notes(test_user):
     """Test various filtering options for getting notes."""
     _clear_notes_table() # Ensure a clean slate for this test
@@ -100,6 +117,14 @@ def test_query_notes(test_user):
     assert len(response.json()) == 1
     assert response.json()[0]["title"] == "Project Ideas"
 
+    # Stopwords in the text don't prevent a match
+    response = client.get("/notes/", params={"title": "Recipe for Pasta"}, headers={"X-API-Key": user_api_key})
+    assert [note["title"] for note in response.json()] == ["Recipe for Pasta"]
+
+    # Text inside a word is found as a substring
+    response = client.get("/notes/", params={"title": "cipe"}, headers={"X-API-Key": user_api_key})
+    assert [note["title"] for note in response.json()] == ["Recipe for Pasta"]
+
     # Query by content
     response = client.get("/notes/", params={"content": "Cheese"}, headers={"X-API-Key": user_api_key})
     assert response.status_code == 200
@@ -108,4 +133,21 @@ def test_query_notes(test_user):
     # Query by a single tag
     response = client.get("/notes/", params={"tags": ["work"]}, headers={"X-API-Key": user_api_key})
     assert response.status_code == 200
-    assert len(response.json()) == 1
\ No newline at end of file
+    assert len(response.json()) == 1
+
+def test_log_notes_left_out_of_content_search(test_user):
+    """Test that notes marked as logs are not found by content search, and every other note is."""
+    _clear_notes_table()
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+
+    client.post("/notes/", json={"title": "History", "content": "ZMcheese", "is_log": True}, headers={"X-API-Key": user_api_key})
+    client.post("/notes/", json={"title": "Plain", "content": "ZMcheese"}, headers={"X-API-Key": user_api_key})
+
+    for content in ["ZMcheese", "chee"]:
+        response = client.get("/notes/", params={"content": content}, headers={"X-API-Key": user_api_key})
+        assert [note["title"] for note in response.json()] == ["Plain"]
+
+    # The log is still found by its title
+    response = client.get("/notes/", params={"title": "History"}, headers={"X-API-Key": user_api_key})
+    assert response.json()[0]["is_log"] is True
@@ -74,6 +74,70 @@ def test_task_crud(test_user):
     response = client.get(f"/tasks/{task_id}", headers={"X-API-Key": user_api_key})
     assert response.status_code == 404
 
+def test_task_access(test_user):
+    """Test that tasks of other users can't be read, updated or deleted."""
+    client = TestClient(app)
+    admin_api_key = unit_test_utils.manual_admin_key_override()
+    other_api_key = client.post("/users/", headers={"X-API-Key": admin_api_key}).json()["api_key"]
+
+    client.post("/tasks/", params={"title": "Private Task"}, headers={"X-API-Key": test_user["api_key"]})
+    task_id = client.get("/tasks/", params={"search_text": "Private Task"}, headers={"X-API-Key": test_user["api_key"]}).json()[0]["id"]
+
+    assert client.get(f"/tasks/{task_id}", headers={"X-API-Key": other_api_key}).status_code == 403
+    assert client.put(f"/tasks/{task_id}", params={"title": "Taken"}, headers={"X-API-Key": other_api_key}).status_code == 403
+    assert client.delete(f"/tasks/{task_id}", headers={"X-API-Key": other_api_key}).status_code == 403
+    assert client.put(f"/tasks/{task_id + 1000}", params={"title": "Missing"}, headers={"X-API-Key": test_user["api_key"]}).status_code == 404
+
+    # The owner still sees it unchanged
+    response = client.get(f"/tasks/{task_id}", headers={"X-API-Key": test_user["api_key"]})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Private Task"
+
+def test_delete_tasks_bulk(test_user):
+    """Test deleting several tasks in one request, none of them if one can't be deleted."""
+    _clear_tasks_table()
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+    admin_api_key = unit_test_utils.manual_admin_key_override()
+    other_api_key = client.post("/users/", headers={"X-API-Key": admin_api_key}).json()["api_key"]
+
+    ids = [t["id"] for t in client.post("/tasks/bulk", json=[{"title": "Gone 1"}, {"title": "Gone 2"}, {"title": "Kept"}], headers={"X-API-Key": user_api_key}).json()]
+    other_id = client.post("/tasks/bulk", json=[{"title": "Not Mine"}], headers={"X-API-Key": other_api_key}).json()[0]["id"]
+
+    # One of the tasks belongs to someone else, nothing is deleted
+    response = client.post("/tasks/bulk-delete", json={"ids": [ids[0], other_id]}, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 403
+    assert client.get(f"/tasks/{ids[0]}", headers={"X-API-Key": user_api_key}).status_code == 200
+
+    response = client.post("/tasks/bulk-delete", json={"ids": ids[:2]}, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    assert [client.get(f"/tasks/{task_id}", headers={"X-API-Key": user_api_key}).status_code for task_id in ids] == [404, 404, 200]
+
+def test_create_tasks_bulk(test_user):
+    """Test creating several tasks in one request."""
+    _clear_tasks_table()
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+
+    payload = [
+        {"title": "Bulk Task 1", "due_date": datetime.now().isoformat(), "tags": ["bulk"]},
+        {"title": "Bulk Task 2", "status": "in_progress"},
+    ]
+    response = client.post("/tasks/bulk", json=payload, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    created = response.json()
+    assert [t["title"] for t in created] == ["Bulk Task 1", "Bulk Task 2"]
+
+    # The returned ids point to the stored tasks
+    for task in created:
+        response = client.get(f"/tasks/{task['id']}", headers={"X-API-Key": user_api_key})
+        assert response.status_code == 200
+        assert response.json()["title"] == task["title"]
+
+    # Invalid due_date
+    response = client.post("/tasks/bulk", json=[{"title": "Bad", "due_date": "invalid"}], headers={"X-API-Key": user_api_key})
+    assert response.status_code == 400
+
 def test_query_tasks_with_rrule(test_user):
     """Test querying tasks, especially recurring ones."""
     _clear_tasks_table() # Ensure a clean slate for this test
@@ -121,4 +185,92 @@ def test_query_tasks_with_rrule(test_user):
 
     assert response.status_code == 200
     recurring_tasks = response.json()
-    assert len(recurring_tasks) == 5
\ No newline at end of file
+    assert len(recurring_tasks) == 5
+
+    # The occurrences were stored on create, without them the task is expanded at query time
+    cursor = database.get_cursor()
+    cursor.execute("SELECT COUNT(*) FROM task_occurrences")
+    assert cursor.fetchone()[0] == 5
+    cursor.execute("UPDATE tasks SET occurrences_until = NULL")
+    database.get_connection().commit()
+
+    response = client.get("/tasks/", params={
+        "tags": ["recurring"],
+        "due_after": query_start,
+        "due_before": query_end
+    }, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    assert [t["due_date"] for t in response.json()] == [t["due_date"] for t in recurring_tasks]
+
+    # Only the first occurrences by due date
+    response = client.get("/tasks/", params={
+        "due_after": query_start,
+        "due_before": query_end,
+        "limit": 3
+    }, headers={"X-API-Key": user_api_key})
+
+    assert response.status_code == 200
+    limited_tasks = response.json()
+    assert [t["due_date"] for t in limited_tasks] == [t["due_date"] for t in tasks[:3]]
+
+def test_query_tasks_etag(test_user):
+    """Test that unchanged task queries are answered with 304."""
+    _clear_tasks_table()
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+
+    client.post("/tasks/", params={"title": "Cached Task", "status": "pending"}, headers={"X-API-Key": user_api_key})
+
+    response = client.get("/tasks/", params={"status": "pending"}, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/tasks/", params={"status": "pending"}, headers={"X-API-Key": user_api_key, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Other query parameters mean another ETag
+    response = client.get("/tasks/", params={"status": "completed"}, headers={"X-API-Key": user_api_key, "If-None-Match": etag})
+    assert response.status_code == 200
+
+    # Deleting a task changes the ETag
+    task_id = client.get("/tasks/", params={"status": "pending"}, headers={"X-API-Key": user_api_key}).json()[0]["id"]
+    client.delete(f"/tasks/{task_id}", headers={"X-API-Key": user_api_key})
+    response = client.get("/tasks/", params={"status": "pending"}, headers={"X-API-Key": user_api_key, "If-None-Match": etag})
+    assert response.status_code == 200
+
+def test_query_tasks_etag_same_second(test_user):
+    """Test that every update changes the ETag, also several within one second."""
+    _clear_tasks_table()
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+
+    client.post("/tasks/", params={"title": "Quick Task", "status": "pending"}, headers={"X-API-Key": user_api_key})
+    response = client.get("/tasks/", headers={"X-API-Key": user_api_key})
+    task_id = response.json()[0]["id"]
+    etag = response.headers["ETag"]
+
+    for title in ["First Edit", "Second Edit"]:
+        client.put(f"/tasks/{task_id}", params={"title": title}, headers={"X-API-Key": user_api_key})
+        response = client.get("/tasks/", headers={"X-API-Key": user_api_key, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()[0]["title"] == title
+        etag = response.headers["ETag"]
+
+
+def test_query_tasks_search_text(test_user):
+    """Test that the text search ignores stopwords and still finds text inside words."""
+    _clear_tasks_table()
+    client = TestClient(app)
+    user_api_key = test_user["api_key"]
+
+    client.post("/tasks/", params={"title": "Weekly report for the team"}, headers={"X-API-Key": user_api_key})
+
+    response = client.get("/tasks/", params={"search_text": "report for the team"}, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    assert [task["title"] for task in response.json()] == ["Weekly report for the team"]
+
+    # A prefix match doesn't hide the tasks containing the text inside a word
+    client.post("/tasks/", params={"title": "Portal login"}, headers={"X-API-Key": user_api_key})
+    response = client.get("/tasks/", params={"search_text": "port"}, headers={"X-API-Key": user_api_key})
+    assert response.status_code == 200
+    assert sorted(task["title"] for task in response.json()) == ["Portal login", "Weekly report for the team"]
@@ -176,6 +176,22 @@ def test_user_actions():
     db_user = cursor.fetchone()
     assert db_user is None
 
+    # Deleting again finds no user
+    response = client.delete(
+        f"/users/{user_id}",
+        headers={"X-API-Key": admin_api_key}
+    )
+    assert response.status_code == 404
+
+    # Admin users cannot be deleted
+    cursor.execute("SELECT id FROM users WHERE role = 'admin' LIMIT 1")
+    admin_id = cursor.fetchone()[0]
+    response = client.delete(
+        f"/users/{admin_id}",
+        headers={"X-API-Key": admin_api_key}
+    )
+    assert response.status_code == 403
+
 def test_reroll_api_key():
     # Test API key reroll functionality
     client = TestClient(app)
@@ -33,17 +33,26 @@ def test_database_operations():
     assert result == (1, 'test')
     cursor.close()
 
+def test_iter_rows():
+    cursor = database.get_cursor()
+    cursor.execute(f"USE {database.MYSQL_DATABASE}")
+    cursor.execute("CREATE TEMPORARY TABLE test_rows (id INT)")
+    cursor.executemany("INSERT INTO test_rows VALUES (%s)", [(i,) for i in range(10)])
+    cursor.execute("SELECT id FROM test_rows ORDER BY id")
+    assert [row[0] for row in database.iter_rows(cursor, batch_size=3)] == list(range(10))
+    cursor.close()
+
 def test_connection_with_bad_creds():
     original_password = database.MYSQL_PASSWORD
     database.MYSQL_PASSWORD = "wrong_password"
-    database._connection = None
+    database._local.connection = None
     with pytest.raises(mysql.connector.Error):
         database.get_connection()
     database.MYSQL_PASSWORD = original_password
-    database._connection = None
+    database._local.connection = None
 
 def test_close_connection():
     database.get_connection()
-    assert database._connection.is_connected()
+    assert database._local.connection.is_connected()
     database.close_connection()
-    assert database._connection is None
\ No newline at end of file
+    assert database._local.connection is None
\ No newline at end of file
@@ -69,4 +69,37 @@ def test_setup_database():
     
     # Second time should skip and return False
     result = setup.setup_database()
-    assert result == False
\ No newline at end of file
+    assert result == False
+
+def test_migrate_schema():
+    setup.create_db_and_scheme()
+
+    # Running it again on an up to date database must be a no-op
+    setup.migrate_schema()
+
+    cursor = database.get_cursor()
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics WHERE table_schema = %s",
+        (database.MYSQL_DATABASE,)
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    assert all(index_name in indexes for _, index_name, _ in setup.SCHEMA_INDEXES)
+    assert not any(index_name in indexes for _, index_name in setup.OBSOLETE_INDEXES)
+
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = %s",
+        (database.MYSQL_DATABASE,)
+    )
+    columns = [row[0] for row in cursor.fetchall()]
+    assert all(column_name in columns for _, column_name, _ in setup.SCHEMA_COLUMNS)
+
+    for table, column_name, column_type, _ in setup.SCHEMA_COLUMN_TYPES:
+        cursor.execute(
+            "SELECT column_type FROM information_schema.columns WHERE table_schema = %s AND table_name = %s AND column_name = %s",
+            (database.MYSQL_DATABASE, table, column_name)
+        )
+        assert cursor.fetchone()[0].lower() == column_type
+
+    cursor.execute("SHOW TABLES")
+    tables = [row[0] for row in cursor.fetchall()]
+    assert all(table in tables for table, _, _ in setup.SCHEMA_TABLES)
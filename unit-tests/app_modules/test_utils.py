@@ -8,6 +8,7 @@ from fastapi import HTTPException
 from utils import *
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from unit_test_utils import setup_test_user, cleanup_test_users, create_test_calendar_entry
+from database import get_cursor, get_connection
 
 @pytest.fixture(autouse=True)
 def setup_teardown():
@@ -34,6 +35,17 @@ def test_validate_api_key(setup_teardown):
     uid, role, perm = validate_api_key("invalid")
     assert not uid and not role and not perm
 
+def test_validate_api_key_cache(setup_teardown):
+    user_id, api_key, _, _ = setup_teardown
+    assert validate_api_key(api_key)[0] == user_id
+    # Answered from the cache while the stored hash changes behind it
+    cursor = get_cursor()
+    cursor.execute("UPDATE users SET api_key_hash = %s WHERE id = %s", (hash_api_key("replaced"), user_id))
+    get_connection().commit()
+    assert validate_api_key(api_key)[0] == user_id
+    invalidate_api_key_cache(user_id)
+    assert validate_api_key(api_key)[0] is None
+
 def test_validate_user_for_action(setup_teardown):
     user_id, api_key, admin_id, admin_key = setup_teardown
     result = validate_user_for_action(api_key)
@@ -76,18 +88,82 @@ def test_validate_entry_access(setup_teardown):
     with pytest.raises(HTTPException):
         validate_entry_access("invalid", ResourceType.CALENDAR, entry_id)
 
+def test_validate_entry_access_batch(setup_teardown):
+    user_id, api_key, admin_id, admin_key = setup_teardown
+    entry_ids = [create_test_calendar_entry(user_id), create_test_calendar_entry(user_id)]
+    uid, _ = validate_entry_access_batch(api_key, ResourceType.CALENDAR, entry_ids)
+    assert uid == user_id
+
+    # One missing or foreign entry fails the whole batch
+    with pytest.raises(HTTPException, match="entry not found"):
+        validate_entry_access_batch(api_key, ResourceType.CALENDAR, entry_ids + [99999])
+    other_entry = create_test_calendar_entry(admin_id)
+    with pytest.raises(HTTPException, match="Access denied"):
+        validate_entry_access_batch(api_key, ResourceType.CALENDAR, entry_ids + [other_entry])
+
+    # Admins may access entries of all users
+    uid, role = validate_entry_access_batch(admin_key, ResourceType.CALENDAR, entry_ids + [other_entry])
+    assert uid == admin_id and role == "admin"
+
 def test_handle_rrule_query():
     result = handle_rrule_query([], None, None)
     assert result == []
     with pytest.raises(HTTPException):
         handle_rrule_query([{"rrule": "test"}], None, None)
 
+def test_handle_rrule_query_expansion():
+    start = datetime.datetime(2024, 1, 3, 9)  # a Wednesday
+    event = {"id": 1, "user_id": "u", "title": "Standup", "start_datetime": start,
+             "end_datetime": start + datetime.timedelta(hours=1), "rrule": "FREQ=WEEKLY;BYDAY=MO;COUNT=2"}
+    mondays = [datetime.datetime(2024, 1, 8, 9), datetime.datetime(2024, 1, 15, 9)]
+
+    # The start counts as occurrence even if the rule doesn't produce it, as in iCalendar
+    result = handle_rrule_query([event], datetime.datetime(2024, 1, 1), datetime.datetime(2024, 2, 1))
+    assert [occ["start_datetime"] for occ in result] == [start] + mondays
+    assert result[1]["end_datetime"] == mondays[0] + datetime.timedelta(hours=1)
+
+    # Occurrences still running at the start of the window are included
+    result = handle_rrule_query([event], datetime.datetime(2024, 1, 8, 9, 30), datetime.datetime(2024, 2, 1))
+    assert [occ["start_datetime"] for occ in result] == mondays
+
+    # Rules dateutil doesn't take directly go through iCalendar, with the same results
+    utc_event = dict(event, rrule="FREQ=WEEKLY;BYDAY=MO;UNTIL=20240115T090000Z")
+    result = handle_rrule_query([utc_event], datetime.datetime(2024, 1, 1), datetime.datetime(2024, 2, 1))
+    assert [occ["start_datetime"] for occ in result] == [start] + mondays
+
+    # Expansions are cached, a changed event is expanded again
+    renamed = dict(event, title="Retro")
+    result = handle_rrule_query([renamed], datetime.datetime(2024, 1, 1), datetime.datetime(2024, 2, 1))
+    assert [occ["title"] for occ in result] == ["Retro"] * 3
+
 def test_list_to_json():
-    assert list_to_json(["a", "b"]) == '["a", "b"]'
+    assert list_to_json(["a", "b"]) == '["a","b"]'
     assert list_to_json(None) is None
     with pytest.raises(TypeError):
         list_to_json(set([1, 2, 3]))
 
 def test_validate_time_format():
     assert validate_time_format("2023-01-01T10:00:00")
-    assert validate_time_format("invalid") is None
\ No newline at end of file
+    assert validate_time_format("invalid") is None
+
+def test_to_fulltext_query():
+    assert to_fulltext_query("My First Task") == "+First* +Task*"
+    assert to_fulltext_query("weekly-report") == "+weekly* +report*"
+    assert to_fulltext_query("ab") is None
+    # Stopwords are not indexed, requiring them would match nothing
+    assert to_fulltext_query("Recipe for the Pasta") == "+Recipe* +Pasta*"
+    assert to_fulltext_query("What about this") is None
+
+def test_parse_tags():
+    assert parse_tags('["a", "b"]') == ["a", "b"]
+    assert parse_tags(b'["a"]') == ["a"]
+    assert parse_tags(["a"]) == ["a"]
+    assert parse_tags(None) is None
+    assert parse_tags("invalid") == []
+    assert parse_tags('{"a": 1}') == []
+
+def test_rrule_until():
+    assert rrule_until("FREQ=DAILY;UNTIL=20240105T103000Z") == datetime.datetime(2024, 1, 5, 10, 30)
+    assert rrule_until("FREQ=DAILY;UNTIL=20240105") == datetime.datetime(2024, 1, 5, 23, 59, 59)
+    assert rrule_until("FREQ=DAILY;COUNT=5") is None
+    assert rrule_until(None) is None
\ No newline at end of file
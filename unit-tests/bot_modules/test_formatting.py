@@ -0,0 +1,34 @@
+# Test the markdown to Telegram HTML conversion of the bot
+
+import importlib.util
+import sys
+import os
+import pytest
+
+# The bot's clients are created on import, they need their packages and some configuration but no connection
+for package in ("telebot", "openai", "tiktoken", "msgpack", "zstandard"):
+    pytest.importorskip(package)
+os.environ.setdefault("TELEGRAM_API_KEY", "123456:test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("ORGANIZR_BASE_URL", "http://localhost:8000")
+
+# Loaded under its own name, the api's app module is imported as "app" by the other tests
+BOT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'bot')
+sys.path.append(BOT_DIR)
+_spec = importlib.util.spec_from_file_location("bot_app", os.path.join(BOT_DIR, "app.py"))
+bot_app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bot_app)
+parse_md_to_telegram_html = bot_app.parse_md_to_telegram_html
+
+def test_inline_formatting():
+    assert parse_md_to_telegram_html("**bold** and *italic*") == "<b>bold</b> and <i>italic</i>"
+
+def test_code_is_escaped():
+    assert parse_md_to_telegram_html("`a<b`") == "<code>a&lt;b</code>"
+    assert parse_md_to_telegram_html("```py\nx = 1 < 2\n```") == "<pre>x = 1 &lt; 2</pre>"
+
+def test_placeholder_followed_by_digit():
+    """Text right after protected content must not be taken as part of its placeholder."""
+    assert parse_md_to_telegram_html("Water is `H`2O and `x`") == "Water is <code>H</code>2O and <code>x</code>"
+    many = " ".join(f"`c{i}`{i}" for i in range(12))
+    assert parse_md_to_telegram_html(many) == " ".join(f"<code>c{i}</code>{i}" for i in range(12))